@@ -0,0 +1,113 @@
+import unicodedata
+from bisect import bisect_left, insort
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, para comparar o que o operador digita"""
+    texto = (texto or '').lower()
+    if texto.isascii():
+        return texto
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+
+class CompletadorMateriais:
+    """Sugestões de materiais pelo começo do código ou de palavras da descrição
+
+    Mantém dois vetores ordenados (códigos e palavras da descrição, já
+    normalizados) e acha o intervalo do prefixo com bisect; só percorre as
+    entradas que casam, até o limite. O índice é refeito quando a versão do
+    catálogo muda; inserções e exclusões feitas pelo DatabaseManager são
+    aplicadas direto nos vetores, sem refazer tudo.
+    """
+
+    def __init__(self, catalogo, limite=10):
+        self.catalogo = catalogo
+        self.limite = limite
+        self._versao = None
+        self._codigos = []     # (código normalizado, código)
+        self._palavras = []    # (palavra normalizada, código)
+        self._descricoes = {}  # código -> palavras da descrição normalizadas
+        catalogo.db_manager.adicionar_ouvinte(self._on_alteracao)
+
+    def sugerir(self, texto, limite=None):
+        """Materiais (MaterialCatalogo) cujo código ou descrição começa com o texto
+
+        Com várias palavras, a primeira busca no índice e as demais precisam
+        começar alguma palavra da descrição. Códigos vêm antes das descrições.
+        """
+        limite = limite or self.limite
+        termos = normalizar(texto).split()
+        if not termos:
+            return []
+        self._atualizar()
+
+        codigos = []
+        vistos = set()
+        if len(termos) == 1:
+            self._coletar(self._codigos, termos[0], codigos, vistos, limite)
+        if len(codigos) < limite:
+            self._coletar(self._palavras, termos[0], codigos, vistos, limite, termos[1:])
+
+        return [self.catalogo.obter(codigo) for codigo in codigos]
+
+    def _coletar(self, indice, prefixo, codigos, vistos, limite, restantes=()):
+        i = bisect_left(indice, (prefixo,))
+        while i < len(indice) and len(codigos) < limite:
+            chave, codigo = indice[i]
+            if not chave.startswith(prefixo):
+                break
+            i += 1
+            if codigo in vistos:
+                continue
+            if restantes and not self._contem_palavras(codigo, restantes):
+                continue
+            vistos.add(codigo)
+            codigos.append(codigo)
+
+    def _contem_palavras(self, codigo, prefixos):
+        palavras = self._descricoes[codigo]
+        return all(any(palavra.startswith(p) for palavra in palavras) for p in prefixos)
+
+    def _on_alteracao(self, evento, dados):
+        """Aplica inserção/exclusão no índice (o catálogo já foi atualizado antes)"""
+        if self._versao != self.catalogo.versao - 1:
+            return  # Índice já desatualizado: a próxima sugestão refaz tudo
+
+        if evento == 'inserido':
+            codigo = dados['material']
+            tokens = normalizar(dados['descricao']).split()
+            insort(self._codigos, (normalizar(codigo), codigo))
+            for token in set(tokens):
+                insort(self._palavras, (token, codigo))
+            self._descricoes[codigo] = tokens
+        elif evento == 'deletado':
+            codigos = set(self._descricoes) - {m.material for m in self.catalogo.materiais()}
+            self._codigos = [entrada for entrada in self._codigos if entrada[1] not in codigos]
+            self._palavras = [entrada for entrada in self._palavras if entrada[1] not in codigos]
+            for codigo in codigos:
+                self._descricoes.pop(codigo, None)
+        else:
+            return
+        self._versao = self.catalogo.versao
+
+    def _atualizar(self):
+        if self._versao == self.catalogo.versao:
+            return
+
+        materiais = self.catalogo.materiais()
+        codigos = []
+        palavras = []
+        descricoes = {}
+        for material in materiais:
+            codigos.append((normalizar(material.material), material.material))
+            tokens = normalizar(material.descricao).split()
+            descricoes[material.material] = tokens
+            palavras.extend((token, material.material) for token in set(tokens))
+
+        codigos.sort()
+        palavras.sort()
+        self._codigos = codigos
+        self._palavras = palavras
+        self._descricoes = descricoes
+        self._versao = self.catalogo.versao
+        print(f"🔎 Índice de sugestões refeito: {len(codigos)} materiais")
@@ -0,0 +1,141 @@
+from collections import namedtuple, OrderedDict
+
+# Material como fica no índice em memória (tipo e validade efetiva vêm gravados no banco)
+MaterialCatalogo = namedtuple('MaterialCatalogo', [
+    'id', 'material', 'descricao', 'dias_validade', 'categoria', 'sopa_especial',
+    'tipo', 'validade_dias'
+])
+
+
+def _entrada(classificador, id_material, material, descricao, dias_validade, categoria, sopa_especial,
+             tipo, validade_dias):
+    if tipo is None:
+        # Linha gravada sem classificação (ex: por versão antiga em outra estação)
+        tipo, validade_dias = classificador.classificar(descricao, dias_validade, categoria, sopa_especial)
+    return MaterialCatalogo(
+        id_material, material, descricao, dias_validade, categoria, sopa_especial, tipo, validade_dias
+    )
+
+
+class CodigosDesconhecidos:
+    """Cache limitado de códigos lidos que não existem no cadastro
+
+    Guarda quantas vezes cada código desconhecido apareceu (os mais antigos
+    saem quando passa do limite), para a tela rejeitar leituras repetidas sem
+    nova busca e mostrar contadores em vez de caixas de diálogo.
+    """
+
+    def __init__(self, limite=1000):
+        self.limite = limite
+        self.total = 0                 # Leituras desconhecidas desde o início
+        self._codigos = OrderedDict()  # código -> vezes
+
+    def __contains__(self, codigo):
+        return codigo in self._codigos
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def registrar(self, codigo):
+        """Conta mais uma leitura do código desconhecido e retorna quantas já foram"""
+        vezes = self._codigos.pop(codigo, 0) + 1
+        self._codigos[codigo] = vezes
+        if len(self._codigos) > self.limite:
+            self._codigos.popitem(last=False)
+        self.total += 1
+        return vezes
+
+    def descartar(self, codigo):
+        self._codigos.pop(codigo, None)
+
+    def limpar(self):
+        self._codigos.clear()
+
+    def mais_frequentes(self, quantidade=5):
+        """[(código, vezes)] dos desconhecidos mais lidos"""
+        return sorted(self._codigos.items(), key=lambda item: item[1], reverse=True)[:quantidade]
+
+
+class CatalogoMateriais:
+    """Índice em memória da tabela materiais, com a classificação gravada no banco
+
+    Carrega a tabela uma vez (na primeira consulta) num dict por código;
+    a partir daí cada leitura é um acesso ao dict, sem ir ao banco. Mudanças
+    feitas pelo DatabaseManager (inserir, deletar, importar) atualizam o
+    índice pelos ouvintes do banco.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._materiais = None   # código -> MaterialCatalogo (None = não carregado)
+        self._por_id = {}        # id -> código
+        self.versao = 0          # Incrementada a cada mudança (índices derivados se refazem)
+        self.desconhecidos = CodigosDesconhecidos()
+        db_manager.adicionar_ouvinte(self._on_alteracao)
+
+    def obter(self, codigo):
+        """Material pelo código exato (None se não existir)"""
+        return self._indice().get(codigo)
+
+    def __len__(self):
+        return len(self._indice())
+
+    def materiais(self):
+        """Todos os materiais do índice"""
+        return list(self._indice().values())
+
+    def invalidar(self):
+        """Descarta o índice; a próxima consulta recarrega do banco"""
+        self._materiais = None
+        self._por_id = {}
+        self.versao += 1
+
+    def _indice(self):
+        if self._materiais is None:
+            self._carregar()
+        return self._materiais
+
+    def _carregar(self):
+        cursor = self.db_manager.get_cursor()
+        cursor.execute('''
+            SELECT id, material, descricao, dias_validade, categoria, sopa_especial,
+                   tipo, validade_efetiva
+            FROM materiais
+        ''')
+        classificador = self.db_manager.classificador()
+        materiais = {}
+        por_id = {}
+        for linha in cursor.fetchall():
+            entrada = _entrada(classificador, *linha)
+            materiais[entrada.material] = entrada
+            por_id[entrada.id] = entrada.material
+
+        self._materiais = materiais
+        self._por_id = por_id
+        print(f"📚 Catálogo carregado: {len(materiais)} materiais")
+
+    def _on_alteracao(self, evento, dados):
+        """Aplica no índice a mudança feita no banco"""
+        # Código cadastrado deixa de ser desconhecido
+        if evento == 'inserido':
+            self.desconhecidos.descartar(dados['material'])
+        elif evento == 'recarregar':
+            self.desconhecidos.limpar()
+
+        if self._materiais is None:
+            return  # Ainda não carregado: a primeira consulta já lê o estado atual
+        self.versao += 1
+
+        if evento == 'inserido':
+            entrada = _entrada(
+                self.db_manager.classificador(), dados['id'], dados['material'], dados['descricao'],
+                dados['dias_validade'], dados['categoria'], dados['sopa_especial'], dados['tipo'], dados['validade_efetiva']
+            )
+            self._materiais[entrada.material] = entrada
+            self._por_id[entrada.id] = entrada.material
+        elif evento == 'deletado':
+            codigo = self._por_id.pop(dados, None)
+            if codigo is not None:
+                self._materiais.pop(codigo, None)
+        else:
+            self.invalidar()
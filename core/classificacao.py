@@ -0,0 +1,73 @@
+import re
+
+# Palavras que identificam uma sopa pela descrição
+PALAVRAS_SOPA = ('sopa', 'caldo', 'cremoso', 'líquido', 'potage')
+
+# Regras padrão (gravadas em regras_sopa num banco novo): (tipo_regra, padrao, validade_dias)
+REGRAS_PADRAO = [('categoria', 'sopa', None)] + [('palavra', palavra, None) for palavra in PALAVRAS_SOPA]
+
+# Separa categoria e descrição no texto único testado pelo matcher
+_SEPARADOR = '\x00'
+
+
+class ClassificadorSopa:
+    """Regras de sopa compiladas numa única expressão regular
+
+    Cada regra vira um lookahead opcional com grupo nomeado, todos ancorados
+    no início de "categoria\\0descrição": as de categoria só casam antes do
+    separador e as de palavra-chave só depois dele. Um único `match` diz
+    quais regras casaram, e vale a primeira delas na ordem das regras (para
+    aplicar a validade sobrescrita, se a regra tiver uma).
+    """
+
+    def __init__(self, regras):
+        """`regras` são tuplas (tipo_regra, padrao, validade_dias) em ordem de prioridade (vale a primeira que casar)"""
+        self.regras = [tuple(regra) for regra in regras]
+        self._validades = {}
+        alternativas = []
+        for indice, (tipo_regra, padrao, validade_dias) in enumerate(self.regras):
+            if not padrao:
+                continue
+            grupo = f'r{indice}'
+            texto = re.escape(padrao.lower())
+            if tipo_regra == 'categoria':
+                alternativas.append(f'(?:(?=(?P<{grupo}>[^{_SEPARADOR}]*?{texto})))?')
+            else:
+                alternativas.append(f'(?:(?=(?P<{grupo}>[^{_SEPARADOR}]*{_SEPARADOR}.*?{texto})))?')
+            self._validades[grupo] = validade_dias
+        self._regex = re.compile(''.join(alternativas), re.DOTALL) if alternativas else None
+
+    def regra(self, categoria, descricao):
+        """Grupo da primeira regra que casou (None se o material não é sopa)"""
+        if self._regex is None:
+            return None
+        texto = f'{(categoria or "").lower()}{_SEPARADOR}{(descricao or "").lower()}'
+        grupos = self._regex.match(texto).groupdict()
+        return next((grupo for grupo, trecho in grupos.items() if trecho is not None), None)
+
+    def classificar(self, descricao, dias_validade, categoria, sopa_especial):
+        """Classificação gravada junto com o material: (tipo, validade efetiva em dias)"""
+        grupo = self.regra(categoria, descricao)
+        if grupo is None:
+            return 'normal', dias_validade
+
+        validade_regra = self._validades[grupo]
+        if validade_regra is not None:
+            return 'sopa', validade_regra
+        return 'sopa', calcular_validade(dias_validade, True, sopa_especial)
+
+
+def calcular_validade(dias_validade, sopa, sopa_especial):
+    """Calcula a validade baseada nas regras de negócio"""
+    if not sopa:
+        return dias_validade
+
+    # Para sopas normais
+    if dias_validade <= 30:
+        return dias_validade
+
+    # Para sopas especiais (SP=S), dobrar a validade de 30 para 90
+    if sopa_especial == 'S' and dias_validade == 30:
+        return 90
+
+    return dias_validade
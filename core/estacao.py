@@ -0,0 +1,47 @@
+import time
+from collections import deque
+
+
+class MetricasEstacao:
+    """Medidas do modo estação: latência leitura → fila e etiquetas por hora
+
+    A latência vai da leitura do código (Enter do scanner) até o trabalho
+    entrar na fila de impressão. As últimas AMOSTRAS leituras entram na
+    média e no p95; o ritmo conta as etiquetas desde que o modo foi ligado.
+    """
+
+    AMOSTRAS = 500
+
+    def __init__(self):
+        self._latencias = deque(maxlen=self.AMOSTRAS)
+        self.iniciar()
+
+    def iniciar(self):
+        """Começa uma nova sessão de operador (zera as contagens)"""
+        self._latencias.clear()
+        self.inicio = time.monotonic()
+        self.leituras = 0
+        self.etiquetas = 0
+
+    def registrar(self, latencia, etiquetas=1):
+        """Leitura que virou trabalho na fila em `latencia` segundos"""
+        self._latencias.append(latencia)
+        self.leituras += 1
+        self.etiquetas += etiquetas
+
+    def resumo(self):
+        """dict com leituras, etiquetas, etiquetas_por_hora e latências (ms)"""
+        horas = max(time.monotonic() - self.inicio, 1.0) / 3600
+        ordenadas = sorted(self._latencias)
+        if ordenadas:
+            media_ms = sum(ordenadas) / len(ordenadas) * 1000
+            p95_ms = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))] * 1000
+        else:
+            media_ms = p95_ms = 0.0
+        return {
+            'leituras': self.leituras,
+            'etiquetas': self.etiquetas,
+            'etiquetas_por_hora': self.etiquetas / horas,
+            'latencia_media_ms': media_ms,
+            'latencia_p95_ms': p95_ms
+        }
@@ -0,0 +1,795 @@
+import collections
+import itertools
+import queue
+import threading
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from core.zpl_generator import ZPLGenerator
+from database.journal_impressao import JournalAtrasado
+
+# Faixas de prioridade, da mais para a menos urgente
+PRIORIDADES = ('urgente', 'normal', 'segundo_plano')
+NOMES_PRIORIDADE = {
+    'urgente': "🔴 Urgente",
+    'normal': "🟡 Normal",
+    'segundo_plano': "⚪ Segundo plano",
+}
+
+
+class TrabalhoImpressao:
+    """Job de impressão aguardando na fila
+
+    `blocos` é a lista (zpl, quantidade) de ZPLGenerator.gerar_blocos_lote;
+    `impressora` pode ser o nome de uma impressora ou de um pool.
+    `tipo` ('normal'/'sopa') vai para o log de impressões e `prioridade` é
+    uma das PRIORIDADES.
+    """
+
+    _proximo_id = itertools.count(1)
+
+    def __init__(self, blocos, formatos=None, descricao="", impressora=None, tipo=None, prioridade='normal'):
+        self.id = next(self._proximo_id)
+        self.id_original = self.id   # Partes de um job dividido apontam para o job original
+        self.impressora = impressora
+        self.substituir_blocos(blocos)
+        self.formatos = formatos
+        self.descricao = descricao
+        self.tipo = tipo
+        self.prioridade = prioridade if prioridade in PRIORIDADES else 'normal'
+        self.criado_em = time.monotonic()
+        self.iniciado_em = None   # Primeira remessa enviada (fim da espera na fila)
+        self.journal_id = None   # Registro no JournalImpressao (se houver)
+        self.offset = 0   # Posição da primeira etiqueta de `blocos` no job original (partes e retomadas)
+
+        # Pool de origem e impressoras já tentadas (failover)
+        self.pool = None
+        self.tentadas = set()
+
+    def substituir_blocos(self, blocos):
+        """Troca as etiquetas do trabalho (ex: só as que faltam após falha no meio do lote)"""
+        self.blocos = blocos
+        self.zpl = ZPLGenerator.montar_stream(blocos)
+        self.quantidade = sum(quantidade for _, quantidade in blocos)
+
+    def dividir(self, partes):
+        """Divide as etiquetas em até `partes` jobs de tamanho parecido"""
+        alvo = -(-self.quantidade // partes)
+        divisoes = []
+        atual = []
+        contagem = 0
+
+        for zpl, quantidade in self.blocos:
+            while quantidade > 0:
+                n = min(quantidade, alvo - contagem)
+                atual.append((zpl, n))
+                contagem += n
+                quantidade -= n
+                if contagem == alvo:
+                    divisoes.append(atual)
+                    atual = []
+                    contagem = 0
+        if atual:
+            divisoes.append(atual)
+
+        resultado = []
+        offset = self.offset
+        for blocos in divisoes:
+            parte = TrabalhoImpressao(
+                blocos, self.formatos, self.descricao, self.impressora, self.tipo, self.prioridade
+            )
+            parte.id_original = self.id
+            parte.journal_id = self.journal_id
+            parte.criado_em = self.criado_em
+            parte.pool = self.pool
+            parte.offset = offset
+            offset += parte.quantidade
+            resultado.append(parte)
+        return resultado
+
+
+def etiquetas_restantes(blocos, enviadas):
+    """Blocos (zpl, quantidade) sem as faixas [inicio, fim) de etiquetas já enviadas
+
+    As etiquetas de um bloco são iguais, então basta descontar de cada bloco
+    quantas das suas posições caem em faixas enviadas.
+    """
+    restantes = []
+    posicao = 0
+    for zpl, quantidade in blocos:
+        fim_bloco = posicao + quantidade
+        saidas = sum(max(0, min(fim, fim_bloco) - max(inicio, posicao)) for inicio, fim in enviadas)
+        if quantidade > saidas:
+            restantes.append((zpl, quantidade - saidas))
+        posicao = fim_bloco
+    return restantes
+
+
+class _TrabalhadorImpressora:
+    """Thread de envio de uma impressora, com faixas de prioridade e agrupamento de jobs próximos"""
+
+    # Limite de trabalhos unidos num mesmo job
+    MAX_AGRUPADOS = 50
+
+    def __init__(self, fila, impressora, capacidade):
+        self.fila = fila
+        self.impressora = impressora
+        self.capacidade = capacidade
+        self._faixas = {prioridade: collections.deque() for prioridade in PRIORIDADES}
+        self._condicao = threading.Condition()
+        self._em_envio = 0
+        self._encerrando = False
+        self._thread = threading.Thread(target=self._executar, name=f"Impressora-{impressora}", daemon=True)
+        self._thread.start()
+
+    def colocar(self, trabalho, na_frente=False):
+        """Coloca um trabalho sem bloquear (queue.Full se estiver cheia)
+
+        Urgentes e trabalhos devolvidos por preempção (`na_frente`) não
+        respeitam a capacidade: nunca são recusados por causa do lote na frente.
+        """
+        with self._condicao:
+            if (not na_frente and trabalho.prioridade != 'urgente'
+                    and self._total() >= self.capacidade):
+                raise queue.Full
+            faixa = self._faixas[trabalho.prioridade]
+            if na_frente:
+                faixa.appendleft(trabalho)
+            else:
+                faixa.append(trabalho)
+            self._condicao.notify()
+
+    def tem_espaco(self, trabalho):
+        """colocar(trabalho) seria aceito agora?"""
+        with self._condicao:
+            return trabalho.prioridade == 'urgente' or self._total() < self.capacidade
+
+    def retirar(self, trabalho):
+        """Tira da fila um trabalho que ainda não começou a ser enviado (False se já saiu)"""
+        with self._condicao:
+            faixa = self._faixas[trabalho.prioridade]
+            if trabalho in faixa:
+                faixa.remove(trabalho)
+                return True
+            return False
+
+    def pendentes(self):
+        with self._condicao:
+            return self._total() + self._em_envio
+
+    def pendentes_por_prioridade(self):
+        with self._condicao:
+            return {prioridade: len(faixa) for prioridade, faixa in self._faixas.items()}
+
+    def tem_mais_urgente(self, prioridade):
+        """Há trabalho esperando numa faixa acima de `prioridade`?"""
+        with self._condicao:
+            return any(self._faixas[p] for p in PRIORIDADES[:PRIORIDADES.index(prioridade)])
+
+    def parar(self, timeout):
+        """Termina de enviar o que está na fila e encerra a thread"""
+        with self._condicao:
+            self._encerrando = True
+            self._condicao.notify()
+        self._thread.join(timeout)
+
+    def _total(self):
+        return sum(len(faixa) for faixa in self._faixas.values())
+
+    def _retirar(self):
+        """Próximo trabalho da faixa mais urgente não vazia (chamar com a condição travada)"""
+        for prioridade in PRIORIDADES:
+            if self._faixas[prioridade]:
+                return self._faixas[prioridade].popleft()
+        return None
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(lambda: self._total() or self._encerrando)
+                primeiro = self._retirar()
+                if primeiro is None:
+                    break
+                grupo = self._agrupar(primeiro)
+                self._em_envio = len(grupo)
+            self.fila._enviar_grupo(self.impressora, grupo, self)
+            with self._condicao:
+                self._em_envio = 0
+
+    def _agrupar(self, primeiro):
+        """Junta ao primeiro os trabalhos da mesma faixa que já esperam ou chegam dentro da janela
+
+        Para de juntar assim que aparece trabalho numa faixa mais urgente.
+        Chamado com a condição travada.
+        """
+        grupo = [primeiro]
+        faixa = self._faixas[primeiro.prioridade]
+        mais_urgentes = PRIORIDADES[:PRIORIDADES.index(primeiro.prioridade)]
+        prazo = time.monotonic() + self.fila.settings_manager.get_janela_agrupamento()
+
+        while len(grupo) < self.MAX_AGRUPADOS:
+            if any(self._faixas[p] for p in mais_urgentes):
+                break
+            if faixa:
+                grupo.append(faixa.popleft())
+                continue
+            restante = prazo - time.monotonic()
+            if restante <= 0 or self._encerrando:
+                break
+            self._condicao.wait(restante)
+
+        return grupo
+
+
+class FilaImpressao(QObject):
+    """Fila de impressão com uma thread por impressora, para a interface nunca esperar o spooler
+
+    Os sinais são emitidos a partir das threads de envio; o Qt os entrega na
+    thread da interface (conexão enfileirada).
+
+    Trabalhos para a mesma impressora que chegam dentro da janela de
+    agrupamento (ou que já estão esperando) são unidos num único payload ZPL,
+    pagando o custo fixo de um job do spooler só uma vez.
+
+    Se o destino for um pool, a impressora é escolhida pela estratégia do pool
+    (rodízio ou menor fila); lotes grandes são divididos entre todas as
+    impressoras saudáveis, e jobs de uma impressora que falhou migram para
+    outra do pool.
+
+    Com o monitor de status do PrinterManager, impressoras com problema
+    conhecido (sem papel, cabeça aberta, pausada...) são recusadas na hora,
+    pelo cache, em vez de receber jobs que não conseguem imprimir.
+
+    Para impressoras de rede acompanhadas pelo monitor, o envio é dosado
+    pela velocidade da impressora: o tempo de cada etiqueta é estimado pelo
+    ^LL e pelo ^PR, e só `etiquetas_a_frente` etiquetas são mandadas além do
+    que ela já deve ter impresso. Assim o buffer da impressora não entope e
+    um lote longo ainda pode ser cancelado. Impressoras pelo spooler
+    recebem o lote num job só (cada remessa seria um job do spooler).
+
+    Cada impressora tem três faixas de prioridade (urgente, normal e
+    pré-impressão em segundo plano). A faixa mais urgente com trabalho é
+    sempre atendida primeiro e, entre uma remessa e outra, um lote menos
+    urgente cede a vez (preempção na fronteira entre etiquetas) e volta
+    para o início da sua faixa com as etiquetas que faltam. O tempo de
+    espera na fila é medido por faixa (`diagnostico`).
+
+    Com um JournalImpressao, cada trabalho é gravado antes de ser enviado
+    (a thread da impressora espera o commit) e tem o estado atualizado ao
+    final; `retomar_pendentes` reenfileira o que não saiu antes de uma queda.
+    Cada remessa entregue é anotada no journal, para que a retomada de um
+    trabalho interrompido no meio reimprima só as etiquetas que faltam.
+    """
+
+    # Lotes a partir deste número de etiquetas são divididos entre o pool
+    LIMITE_DIVISAO = 20
+    # Tempo em que uma impressora que falhou fica fora da escolha do pool
+    ESPERA_APOS_FALHA = 30.0
+    # Meta de espera (p95) da faixa urgente, em segundos
+    META_URGENTE = 5.0
+    # Esperas guardadas por faixa para as estatísticas
+    AMOSTRAS_ESPERA = 1000
+
+    trabalho_enfileirado = pyqtSignal(int, int)   # id, trabalhos pendentes
+    trabalho_enviado = pyqtSignal(int, float)     # id, segundos desde o enfileiramento
+    trabalho_falhou = pyqtSignal(int, str)        # id, mensagem de erro
+    trabalho_cancelado = pyqtSignal(int)          # id
+
+    def __init__(self, printer_manager, settings_manager, capacidade=200, journal=None):
+        super().__init__()
+        self.printer_manager = printer_manager
+        self.settings_manager = settings_manager
+        self.capacidade = capacidade
+        self.journal = journal
+
+        self._trabalhadores = {}
+        self._partes_restantes = {}   # id original -> partes ainda não enviadas
+        self._partes_vivas = {}       # id original -> partes ainda em alguma fila ou em envio
+        self._falhou_em = {}          # impressora -> instante da última falha
+        self._rodizio = {}            # pool -> contador do round-robin
+        self._destinos = {}           # id original -> impressoras que receberam partes
+        self._cancelados = set()      # ids originais cancelados ainda não descartados
+        self._ocupada_ate = {}        # impressora -> instante previsto para terminar o que já recebeu
+        self._acordar = threading.Event()
+        self._parando = False         # parar(): o que falta sai sem esperar a dosagem
+        self._esperas = {p: collections.deque(maxlen=self.AMOSTRAS_ESPERA) for p in PRIORIDADES}
+        self._lock = threading.Lock()
+        
+        # Impressora ociosa no monitor confirma os trabalhos enviados a ela
+        if journal is not None and printer_manager.monitor is not None:
+            printer_manager.monitor.status_atualizado.connect(journal.status_impressora)
+
+    def cancelar(self, trabalho_id=None):
+        """Cancela um trabalho (ou todos, sem id); o que já foi enviado termina de imprimir"""
+        with self._lock:
+            ids = [trabalho_id] if trabalho_id is not None else list(self._partes_restantes)
+            ids = [i for i in ids if i in self._partes_restantes]
+            self._cancelados.update(ids)
+        self._acordar.set()
+        return len(ids)
+
+    def parar(self, timeout=5.0):
+        """Envia os trabalhos pendentes (sem dosar as remessas) e encerra as threads"""
+        self._parando = True
+        self._acordar.set()
+        with self._lock:
+            trabalhadores = list(self._trabalhadores.values())
+            self._trabalhadores.clear()
+        for trabalhador in trabalhadores:
+            trabalhador.parar(timeout)
+
+    def enfileirar(self, trabalho):
+        """Coloca um trabalho na fila sem bloquear; erro se a fila estiver cheia"""
+        partes = [trabalho]
+        pool = self.settings_manager.get_pool(trabalho.impressora)
+
+        if pool:
+            trabalho.pool = trabalho.impressora
+            membros = self._membros_disponiveis(pool, set())
+            if trabalho.quantidade >= self.LIMITE_DIVISAO and len(membros) > 1:
+                partes = trabalho.dividir(len(membros))
+                destinos = membros[:len(partes)]
+                print(f"🔀 Lote de {trabalho.quantidade} etiquetas dividido entre {len(partes)} impressoras")
+            else:
+                destinos = [self._escolher_membro(trabalho.pool, pool, set())]
+        else:
+            pode, motivo = self._preflight(trabalho.impressora)
+            if not pode:
+                raise Exception(motivo)
+            destinos = [trabalho.impressora]
+
+        # Todas as partes precisam caber antes de qualquer uma ir para a fila
+        fila_cheia = f"Fila de impressão cheia ({self.capacidade} trabalhos). Aguarde a impressora."
+        for parte, destino in zip(partes, destinos):
+            if destino is None:
+                raise Exception(f"Nenhuma impressora disponível no pool '{trabalho.pool}'")
+            if not self._trabalhador(destino).tem_espaco(parte):
+                raise Exception(fila_cheia)
+
+        with self._lock:
+            self._partes_restantes[trabalho.id] = len(partes)
+            self._partes_vivas[trabalho.id] = len(partes)
+
+        if self.journal is not None and trabalho.journal_id is None:
+            self.journal.registrar(trabalho)
+            for parte in partes:
+                parte.journal_id = trabalho.journal_id
+
+        colocadas = []
+        try:
+            for parte, destino in zip(partes, destinos):
+                self._colocar(parte, destino)
+                colocadas.append((parte, destino))
+        except Exception as e:
+            erro = fila_cheia if isinstance(e, queue.Full) else str(e)
+            self._desfazer_enfileiramento(trabalho, colocadas, erro)
+            raise Exception(erro)
+
+        self.trabalho_enfileirado.emit(trabalho.id, self.pendentes())
+        return trabalho.id
+
+    def _desfazer_enfileiramento(self, trabalho, colocadas, erro):
+        """Tira da fila as partes já colocadas de um job que não pôde ser enfileirado inteiro
+
+        Se alguma parte já começou a ser enviada, o job é cancelado: o resto
+        não sai e o descarte do cancelamento reporta e atualiza o journal.
+        """
+        em_envio = [parte for parte, destino in colocadas if not self._trabalhador(destino).retirar(parte)]
+        if em_envio:
+            with self._lock:
+                # Só as partes que ficaram na fila (ou saindo) ainda vão ser descartadas
+                self._partes_vivas[trabalho.id] = len(em_envio)
+                self._cancelados.add(trabalho.id)
+            self._acordar.set()
+            return
+
+        with self._lock:
+            self._partes_restantes.pop(trabalho.id, None)
+            self._partes_vivas.pop(trabalho.id, None)
+        if self.journal is not None:
+            self.journal.marcar_falha(trabalho.journal_id, erro)
+
+    def retomar_pendentes(self):
+        """Reenfileira os trabalhos do journal que não chegaram à impressora; retorna quantos"""
+        if self.journal is None:
+            return 0
+
+        retomados = sum(self.retomar(registro) for registro in self.journal.pendentes())
+        if retomados:
+            print(f"♻️ {retomados} trabalho(s) não enviados retomados do journal")
+        return retomados
+
+    def interrompidos(self):
+        """Trabalhos do journal que estavam sendo enviados quando o programa parou
+
+        Podem ter sido impressos no todo ou em parte: não são retomados
+        sozinhos, o operador escolhe entre `retomar` e `descartar`.
+        """
+        return self.journal.interrompidos() if self.journal is not None else []
+
+    def retomar(self, registro):
+        """Reenfileira um trabalho do journal (dict de pendentes/interrompidos); True se entrou na fila
+
+        Só as etiquetas que ainda não tinham sido entregues voltam para a fila.
+        """
+        blocos = etiquetas_restantes(registro['blocos'], registro['enviadas'])
+        if not blocos:
+            # Todas as remessas já tinham saído: só faltou marcar o fim
+            self.journal.marcar_enviado(registro['journal_id'], [registro['impressora']])
+            return False
+        if registro['enviadas']:
+            self.journal.reiniciar(registro['journal_id'], blocos)
+
+        trabalho = TrabalhoImpressao(
+            blocos, registro['formatos'], registro['descricao'],
+            registro['impressora'], registro['tipo'], registro['prioridade']
+        )
+        trabalho.journal_id = registro['journal_id']
+        try:
+            self.enfileirar(trabalho)
+            return True
+        except Exception as e:
+            print(f"❌ Trabalho {trabalho.journal_id} do journal não pôde ser retomado: {e}")
+            self.journal.marcar_falha(trabalho.journal_id, e)
+            return False
+
+    def descartar(self, registro, motivo="Descartado pelo operador"):
+        """Encerra um trabalho do journal sem reimprimir"""
+        self.journal.marcar_falha(registro['journal_id'], motivo)
+
+    def pendentes(self):
+        """Número de trabalhos aguardando envio em todas as impressoras"""
+        return sum(self.pendentes_por_impressora().values())
+
+    def pendentes_por_impressora(self):
+        with self._lock:
+            return {nome: t.pendentes() for nome, t in self._trabalhadores.items()}
+
+    def pendentes_por_prioridade(self):
+        """Trabalhos aguardando em cada faixa, somando todas as impressoras"""
+        with self._lock:
+            trabalhadores = list(self._trabalhadores.values())
+        totais = dict.fromkeys(PRIORIDADES, 0)
+        for trabalhador in trabalhadores:
+            for prioridade, quantidade in trabalhador.pendentes_por_prioridade().items():
+                totais[prioridade] += quantidade
+        return totais
+
+    def estatisticas_espera(self):
+        """Espera na fila (enfileirado -> primeira remessa enviada) por faixa
+
+        {prioridade: {'amostras', 'media', 'p95', 'maxima'}} em segundos,
+        sobre os últimos AMOSTRAS_ESPERA trabalhos de cada faixa.
+        """
+        with self._lock:
+            esperas = {prioridade: sorted(amostras) for prioridade, amostras in self._esperas.items()}
+
+        estatisticas = {}
+        for prioridade, valores in esperas.items():
+            if not valores:
+                estatisticas[prioridade] = {'amostras': 0, 'media': None, 'p95': None, 'maxima': None}
+                continue
+            estatisticas[prioridade] = {
+                'amostras': len(valores),
+                'media': sum(valores) / len(valores),
+                'p95': valores[min(len(valores) - 1, int(len(valores) * 0.95))],
+                'maxima': valores[-1],
+            }
+        return estatisticas
+
+    def diagnostico(self):
+        """Texto com a fila e a espera de cada faixa"""
+        pendentes = self.pendentes_por_prioridade()
+        linhas = []
+        for prioridade, estatistica in self.estatisticas_espera().items():
+            linha = f"{NOMES_PRIORIDADE[prioridade]}: {pendentes[prioridade]} na fila"
+            if estatistica['amostras']:
+                linha += (f", espera média {estatistica['media']:.2f}s, p95 {estatistica['p95']:.2f}s, "
+                          f"máx {estatistica['maxima']:.2f}s ({estatistica['amostras']} trabalhos)")
+                if prioridade == 'urgente':
+                    marcador = "✅" if estatistica['p95'] <= self.META_URGENTE else "⚠️"
+                    linha += f" {marcador} meta p95 ≤ {self.META_URGENTE:.0f}s"
+            else:
+                linha += ", nenhum envio ainda"
+            linhas.append(linha)
+        return "\n".join(linhas)
+
+    def _preflight(self, impressora):
+        """Checagem instantânea da saúde da impressora pelo cache do monitor"""
+        monitor = self.printer_manager.monitor
+        if monitor is None:
+            return True, None
+        return monitor.pode_imprimir(impressora)
+
+    def _colocar(self, trabalho, impressora):
+        if impressora is None:
+            raise Exception(f"Nenhuma impressora disponível no pool '{trabalho.pool}'")
+        self._trabalhador(impressora).colocar(trabalho)
+        # Acorda remessas esperando vazão: o trabalho novo pode ter prioridade
+        self._acordar.set()
+
+    def _trabalhador(self, impressora):
+        with self._lock:
+            trabalhador = self._trabalhadores.get(impressora)
+            if trabalhador is None:
+                trabalhador = _TrabalhadorImpressora(self, impressora, self.capacidade)
+                self._trabalhadores[impressora] = trabalhador
+            return trabalhador
+
+    def _membros_disponiveis(self, pool, excluir):
+        """Impressoras do pool saudáveis, sem falha recente e ainda não tentadas pelo job"""
+        agora = time.monotonic()
+        return [
+            membro for membro in pool['impressoras']
+            if membro not in excluir
+            and agora - self._falhou_em.get(membro, -self.ESPERA_APOS_FALHA) >= self.ESPERA_APOS_FALHA
+            and self._preflight(membro)[0]
+        ]
+
+    def _escolher_membro(self, nome_pool, pool, excluir):
+        """Escolhe a impressora do pool conforme a estratégia (None se não houver)"""
+        membros = self._membros_disponiveis(pool, excluir)
+        if not membros and not excluir:
+            # Todas falharam há pouco: no primeiro envio, melhor tentar do que recusar
+            membros = list(pool['impressoras'])
+        if not membros:
+            return None
+
+        if pool.get('estrategia') == 'menos_fila':
+            filas = self.pendentes_por_impressora()
+            return min(membros, key=lambda membro: filas.get(membro, 0))
+
+        with self._lock:
+            contador = self._rodizio.get(nome_pool, 0)
+            self._rodizio[nome_pool] = contador + 1
+        return membros[contador % len(membros)]
+
+    def _enviar_grupo(self, impressora, grupo, trabalhador):
+        """Envia o grupo em remessas dosadas pela velocidade da impressora (chamado pela thread dela)
+
+        Antes de cada remessa, se houver trabalho numa faixa mais urgente, o
+        que falta do grupo volta para a fila e a thread atende o urgente.
+        """
+        formatos = {}
+        for trabalho in grupo:
+            formatos.update(trabalho.formatos or {})
+
+        if len(grupo) > 1:
+            print(f"📦 Agrupando {len(grupo)} trabalhos num único job para '{impressora}'")
+
+        # Dosagem só onde o ~HS acompanha a impressora; pelo spooler o lote vai num job só
+        monitor = self.printer_manager.monitor
+        if monitor is not None and monitor.monitorada(impressora):
+            limite = self.settings_manager.get_etiquetas_a_frente()
+        else:
+            limite = 0
+        tempo = ZPLGenerator.tempo_por_etiqueta(
+            self.settings_manager.get_etiqueta_size()['altura'],
+            self.settings_manager.get_velocidade_impressao()
+        )
+        remessas = self._remessas(grupo, limite)
+        if len(remessas) > 1:
+            print(f"🚦 '{impressora}': {sum(t.quantidade for t in grupo)} etiquetas em {len(remessas)} remessas "
+                  f"(até {limite} à frente, ~{tempo:.1f}s por etiqueta)")
+
+        prioridade = grupo[0].prioridade
+        enviadas = {}   # trabalho -> etiquetas dele já entregues nesta chamada
+        for indice, (itens, concluidos) in enumerate(remessas):
+            # Espera a impressora dar vazão; cancelamento ou trabalho novo durante a espera refaz a remessa
+            while True:
+                if trabalhador.tem_mais_urgente(prioridade):
+                    self._devolver(trabalhador, remessas[indice:])
+                    return
+                blocos = [(zpl, quantidade) for zpl, quantidade, trabalho in itens if not self._cancelado(trabalho)]
+                if not blocos or self._aguardar_vazao(impressora, sum(q for _, q in blocos), limite, tempo):
+                    break
+
+            if blocos:
+                self._registrar_inicio(itens)
+                try:
+                    pode, motivo = self._preflight(impressora)
+                    if not pode:
+                        raise Exception(motivo)
+                    # Write-ahead: a remessa só sai depois que o 'enviando' está em disco
+                    if self.journal is not None:
+                        self.journal.marcar_enviando(
+                            {trabalho.journal_id for _, _, trabalho in itens if trabalho.journal_id is not None}
+                        )
+                    self.printer_manager.imprimir(ZPLGenerator.montar_stream(blocos), formatos or None, impressora)
+                except JournalAtrasado as e:
+                    # Problema no banco, não na impressora: outra do pool não resolveria
+                    self._falhar_restantes(impressora, remessas[indice:], e, mover=False)
+                    return
+                except Exception as e:
+                    self._falhou_em[impressora] = time.monotonic()
+                    self._falhar_restantes(impressora, remessas[indice:], e)
+                    return
+
+                agora = time.monotonic()
+                inicio = max(agora, self._ocupada_ate.get(impressora, agora))
+                self._ocupada_ate[impressora] = inicio + sum(q for _, q in blocos) * tempo
+                self._falhou_em.pop(impressora, None)
+                if self.journal is not None:
+                    self._anotar_remessa(itens, enviadas)
+
+            for trabalho in concluidos:
+                if self._cancelado(trabalho):
+                    self._descartar_cancelado(trabalho)
+                else:
+                    self._concluir(trabalho, impressora)
+
+    def _anotar_remessa(self, itens, enviadas):
+        """Grava no journal as faixas de etiquetas (do job original) que a remessa entregou"""
+        for _, quantidade, trabalho in itens:
+            if trabalho.journal_id is None or self._cancelado(trabalho):
+                continue
+            inicio = trabalho.offset + enviadas.get(trabalho, 0)
+            enviadas[trabalho] = enviadas.get(trabalho, 0) + quantidade
+            self.journal.marcar_remessa(trabalho.journal_id, inicio, inicio + quantidade)
+
+    @staticmethod
+    def _remessas(grupo, limite):
+        """Divide as etiquetas do grupo em remessas de até `limite` (0 = uma só remessa)
+
+        Retorna [(itens, concluidos)]: itens são (zpl, quantidade, trabalho) e
+        concluidos os trabalhos cuja última etiqueta está naquela remessa.
+        """
+        remessas = []
+        itens = []
+        concluidos = []
+        contagem = 0
+
+        for trabalho in grupo:
+            for zpl, quantidade in trabalho.blocos:
+                while quantidade > 0:
+                    n = quantidade if not limite else min(quantidade, limite - contagem)
+                    itens.append((zpl, n, trabalho))
+                    contagem += n
+                    quantidade -= n
+                    if limite and contagem == limite:
+                        remessas.append((itens, concluidos))
+                        itens = []
+                        concluidos = []
+                        contagem = 0
+            if itens or not remessas:
+                concluidos.append(trabalho)
+            else:
+                remessas[-1][1].append(trabalho)
+
+        if itens or concluidos:
+            remessas.append((itens, concluidos))
+        return remessas
+
+    def _aguardar_vazao(self, impressora, etiquetas, limite, tempo):
+        """Espera a impressora ter espaço para mais `etiquetas`; False se acordada (cancelamento/trabalho novo)"""
+        if not limite:
+            return True
+        while not self._parando:
+            a_frente = (self._ocupada_ate.get(impressora, 0.0) - time.monotonic()) / tempo
+            espera = (a_frente + etiquetas - limite) * tempo
+            if espera <= 0:
+                return True
+            if self._acordar.wait(espera):
+                self._acordar.clear()
+                return False
+        return True
+
+    def _cancelado(self, trabalho):
+        return trabalho.id_original in self._cancelados
+
+    def _encerrar_parte(self, trabalho):
+        """Uma parte do job saiu de vez da fila (chamar com o lock travado)
+
+        O cancelamento vale até a última parte viva ser descartada ou
+        terminar: as partes nas filas das outras impressoras do pool
+        também precisam enxergá-lo.
+        """
+        vivas = self._partes_vivas.get(trabalho.id_original, 1) - 1
+        if vivas > 0:
+            self._partes_vivas[trabalho.id_original] = vivas
+        else:
+            self._partes_vivas.pop(trabalho.id_original, None)
+            self._cancelados.discard(trabalho.id_original)
+
+    def _descartar_cancelado(self, trabalho):
+        """Remove o trabalho cancelado da contagem e avisa (uma vez por job original)"""
+        with self._lock:
+            reportar = self._partes_restantes.pop(trabalho.id_original, None) is not None
+            self._destinos.pop(trabalho.id_original, None)
+            self._encerrar_parte(trabalho)
+        if reportar:
+            print(f"⛔ Trabalho {trabalho.id_original} cancelado")
+            if self.journal is not None:
+                self.journal.marcar_falha(trabalho.journal_id, "Cancelado")
+            self.trabalho_cancelado.emit(trabalho.id_original)
+
+    def _registrar_inicio(self, itens):
+        """Marca o fim da espera na fila dos trabalhos que têm etiquetas nesta remessa"""
+        agora = time.monotonic()
+        for _, _, trabalho in itens:
+            if trabalho.iniciado_em is None and not self._cancelado(trabalho):
+                trabalho.iniciado_em = agora
+                with self._lock:
+                    self._esperas[trabalho.prioridade].append(agora - trabalho.criado_em)
+
+    def _restantes(self, remessas):
+        """Trabalhos com etiquetas nas remessas, já reduzidos só ao que não foi enviado
+
+        Cancelados são descartados aqui; a ordem dos trabalhos é mantida.
+        """
+        restantes = {}
+        for itens, _ in remessas:
+            for zpl, quantidade, trabalho in itens:
+                restantes.setdefault(trabalho, []).append((zpl, quantidade))
+
+        trabalhos = []
+        for trabalho, blocos in restantes.items():
+            if self._cancelado(trabalho):
+                self._descartar_cancelado(trabalho)
+                continue
+            if blocos != list(trabalho.blocos):
+                # O que não saiu é sempre o fim das etiquetas do trabalho
+                quantidade = trabalho.quantidade
+                trabalho.substituir_blocos(blocos)
+                trabalho.offset += quantidade - trabalho.quantidade
+            trabalhos.append(trabalho)
+        return trabalhos
+
+    def _devolver(self, trabalhador, remessas):
+        """Preempção: o que falta do grupo volta para o início da sua faixa"""
+        trabalhos = self._restantes(remessas)
+        if trabalhos:
+            print(f"⏸️ '{trabalhador.impressora}': {len(trabalhos)} trabalho(s) cedem a vez a um mais urgente")
+        for trabalho in reversed(trabalhos):
+            trabalhador.colocar(trabalho, na_frente=True)
+
+    def _falhar_restantes(self, impressora, remessas, erro, mover=True):
+        """Trata a falha só com as etiquetas que não chegaram à impressora"""
+        for trabalho in self._restantes(remessas):
+            self._tratar_falha(trabalho, impressora, erro, mover)
+
+    def _tratar_falha(self, trabalho, impressora, erro, mover=True):
+        """Move o trabalho para outra impressora do pool (se `mover`) ou reporta a falha"""
+        trabalho.tentadas.add(impressora)
+
+        if trabalho.pool and mover:
+            pool = self.settings_manager.get_pool(trabalho.pool)
+            destino = self._escolher_membro(trabalho.pool, pool, trabalho.tentadas) if pool else None
+            if destino:
+                try:
+                    self._colocar(trabalho, destino)
+                    print(f"↪️ Trabalho {trabalho.id_original} movido de '{impressora}' para '{destino}'")
+                    return
+                except queue.Full:
+                    pass
+
+        print(f"❌ Trabalho {trabalho.id_original} falhou: {erro}")
+        with self._lock:
+            reportar = self._partes_restantes.pop(trabalho.id_original, None) is not None
+            self._destinos.pop(trabalho.id_original, None)
+            self._encerrar_parte(trabalho)
+        if reportar:
+            if self.journal is not None:
+                self.journal.marcar_falha(trabalho.journal_id, erro)
+            self.trabalho_falhou.emit(trabalho.id_original, str(erro))
+
+    def _concluir(self, trabalho, impressora):
+        """Conta a parte enviada; o job original só conclui quando todas as partes saem"""
+        with self._lock:
+            self._encerrar_parte(trabalho)
+            restantes = self._partes_restantes.get(trabalho.id_original)
+            if restantes is None:
+                return  # Outra parte já falhou
+            destinos = self._destinos.setdefault(trabalho.id_original, set())
+            destinos.add(impressora)
+            if restantes > 1:
+                self._partes_restantes[trabalho.id_original] = restantes - 1
+                return
+            del self._partes_restantes[trabalho.id_original]
+            del self._destinos[trabalho.id_original]
+        if self.journal is not None:
+            monitor = self.printer_manager.monitor
+            confirmaveis = [d for d in destinos if monitor is not None and monitor.monitorada(d)]
+            self.journal.marcar_enviado(trabalho.journal_id, destinos, confirmaveis)
+        self.trabalho_enviado.emit(trabalho.id_original, time.monotonic() - trabalho.criado_em)
@@ -1,74 +1,73 @@
 from datetime import datetime, timedelta
 
+from core.catalogo import CatalogoMateriais
+
 class MaterialDetector:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, catalogo=None):
         self.db_manager = db_manager
+        
+        # Índice em memória dos materiais (consulta sem ir ao banco)
+        self.catalogo = catalogo if catalogo is not None else CatalogoMateriais(db_manager)
     
     def detectar_material(self, codigo):
         """Detecta tipo de material e retorna informações completas"""
         try:
-            cursor = self.db_manager.get_cursor()
-            cursor.execute('''
-                SELECT descricao, dias_validade, categoria, sopa_especial 
-                FROM materiais 
-                WHERE material = ?
-            ''', (codigo,))
+            material = self.catalogo.obter(codigo)
             
-            resultado = cursor.fetchone()
-            
-            if not resultado:
+            if not material:
                 return None
             
-            descricao, dias_validade, categoria, sopa_especial = resultado
-            
-            # Detectar se é sopa
-            eh_sopa = self._eh_sopa(categoria, descricao)
+            data_validade = (datetime.now() + timedelta(days=material.validade_dias)).strftime('%d/%m/%Y')
             
-            # Calcular validade
-            validade_dias = self._calcular_validade(dias_validade, eh_sopa, sopa_especial)
-            data_validade = (datetime.now() + timedelta(days=validade_dias)).strftime('%d/%m/%Y')
-            
-            return {
-                'codigo': codigo,
-                'descricao': descricao,
-                'dias_validade': dias_validade,
-                'categoria': categoria,
-                'sopa_especial': sopa_especial,
-                'tipo': 'sopa' if eh_sopa else 'normal',
-                'data_validade': data_validade,
-                'validade_dias': validade_dias
-            }
+            return self._montar_info(codigo, material, data_validade)
             
         except Exception as e:
             raise Exception(f"Erro ao detectar material: {str(e)}")
     
-    def _eh_sopa(self, categoria, descricao):
-        """Detecta se o material é uma sopa"""
-        # Verificar por categoria
-        if categoria and 'sopa' in categoria.lower():
-            return True
-        
-        # Verificar por palavras-chave na descrição
-        palavras_sopa = ['sopa', 'caldo', 'cremoso', 'líquido', 'potage']
-        descricao_lower = descricao.lower()
+    def detectar_materiais(self, codigos, referencia=None):
+        """Detecta uma lista de códigos de uma vez (ex: linhas de uma ordem de produção)
         
-        for palavra in palavras_sopa:
-            if palavra in descricao_lower:
-                return True
-        
-        return False
+        Todas as validades partem do mesmo instante `referencia` (padrão: agora).
+        Retorna (encontrados, nao_encontrados): dict código -> informações, na
+        ordem da lista, e a lista dos códigos que não existem no cadastro.
+        """
+        try:
+            referencia = referencia or datetime.now()
+            datas = {}  # dias de validade -> data formatada (calculada uma vez)
+            encontrados = {}
+            nao_encontrados = []
+            vistos = set()
+            
+            for codigo in codigos:
+                if codigo in vistos:
+                    continue
+                vistos.add(codigo)
+                
+                material = self.catalogo.obter(codigo)
+                if not material:
+                    nao_encontrados.append(codigo)
+                    continue
+                
+                data_validade = datas.get(material.validade_dias)
+                if data_validade is None:
+                    data_validade = (referencia + timedelta(days=material.validade_dias)).strftime('%d/%m/%Y')
+                    datas[material.validade_dias] = data_validade
+                
+                encontrados[codigo] = self._montar_info(codigo, material, data_validade)
+            
+            return encontrados, nao_encontrados
+            
+        except Exception as e:
+            raise Exception(f"Erro ao detectar materiais: {str(e)}")
     
-    def _calcular_validade(self, dias_validade, eh_sopa, sopa_especial):
-        """Calcula a validade baseada nas regras de negócio"""
-        if not eh_sopa:
-            return dias_validade
-        
-        # Para sopas normais
-        if dias_validade <= 30:
-            return dias_validade
-        
-        # Para sopas especiais (SP=S), dobrar a validade de 30 para 90
-        if sopa_especial == 'S' and dias_validade == 30:
-            return 90
-        
-        return dias_validade
\ No newline at end of file
+    def _montar_info(self, codigo, material, data_validade):
+        return {
+            'codigo': codigo,
+            'descricao': material.descricao,
+            'dias_validade': material.dias_validade,
+            'categoria': material.categoria,
+            'sopa_especial': material.sopa_especial,
+            'tipo': material.tipo,
+            'data_validade': data_validade,
+            'validade_dias': material.validade_dias
+        }
\ No newline at end of file
@@ -0,0 +1,151 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from core.transporte_rede import obter_pool, PORTA_RAW_PADRAO
+
+
+def interpretar_status_hs(resposta):
+    """Interpreta a resposta do ~HS (três blocos STX...ETX separados por vírgulas)"""
+    texto = resposta.decode('ascii', 'ignore')
+    blocos = [bloco.split('\x03')[0].strip() for bloco in texto.split('\x02')[1:]]
+    if len(blocos) < 2:
+        raise ValueError(f"Resposta ~HS inválida: {texto!r}")
+
+    campos1 = blocos[0].split(',')
+    campos2 = blocos[1].split(',')
+    if len(campos1) < 12 or len(campos2) < 11:
+        raise ValueError(f"Resposta ~HS incompleta: {texto!r}")
+
+    problemas = []
+    if campos1[1] == '1':
+        problemas.append("Sem papel")
+    if campos1[2] == '1':
+        problemas.append("Pausada")
+    if campos1[9] == '1':
+        problemas.append("Memória RAM corrompida")
+    if campos1[10] == '1':
+        problemas.append("Temperatura baixa")
+    if campos1[11] == '1':
+        problemas.append("Temperatura alta")
+    if campos2[2] == '1':
+        problemas.append("Cabeça aberta")
+    if campos2[3] == '1' and campos2[4] == '1':
+        problemas.append("Sem ribbon")
+
+    return {
+        'ok': not problemas,
+        'problemas': problemas,
+        'buffer_cheio': campos1[5] == '1',
+        'formatos_no_buffer': int(campos1[4] or 0),
+        'etiquetas_restantes': int(campos2[8] or 0),
+        'timestamp': time.time(),
+        'erro': None,
+    }
+
+
+class MonitorImpressoras(QObject):
+    """Consulta periodicamente (~HS) as impressoras de rede e guarda o estado em cache
+
+    A consulta roda numa thread própria; o envio usa só o cache (sem
+    latência) para não mandar etiquetas a uma impressora sem papel, aberta
+    ou pausada. Só impressoras com transporte TCP podem ser consultadas.
+    """
+
+    status_atualizado = pyqtSignal(str, dict)   # impressora, status
+
+    # Status mais antigo que isto não bloqueia envio (pode estar desatualizado)
+    VALIDADE_STATUS = 30.0
+    # Consultas seguidas sem resposta até a impressora contar como sem comunicação;
+    # antes disso o status anterior continua valendo e o envio decide
+    FALHAS_SEM_COMUNICACAO = 3
+
+    def __init__(self, settings_manager, intervalo=5.0):
+        super().__init__()
+        self.settings_manager = settings_manager
+        self.intervalo = intervalo
+        self._status = {}
+        self._falhas = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="MonitorImpressoras", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def status(self, impressora):
+        """Último status conhecido da impressora (None se não monitorada)"""
+        with self._lock:
+            status = self._status.get(impressora)
+            return dict(status) if status else None
+
+    def pode_imprimir(self, impressora):
+        """Checagem instantânea pelo cache: (True, None) ou (False, motivo)"""
+        status = self.status(impressora)
+        if status is None or time.time() - status['timestamp'] > self.VALIDADE_STATUS:
+            return True, None
+        if status['ok']:
+            return True, None
+        return False, f"Impressora '{impressora}' indisponível: {', '.join(status['problemas'])}"
+
+    def monitorada(self, impressora):
+        """A impressora é consultada por ~HS (só impressoras de rede TCP)"""
+        return self.settings_manager.get_transporte_impressora(impressora)['tipo'] == 'tcp'
+
+    def consultar(self, impressora):
+        """Consulta o status agora (bloqueante) e atualiza o cache
+
+        Uma consulta sem resposta isolada não entra no cache (um ~HS perdido
+        bloquearia os envios por VALIDADE_STATUS): só depois de
+        FALHAS_SEM_COMUNICACAO seguidas a impressora fica "Sem comunicação".
+        """
+        transporte = self.settings_manager.get_transporte_impressora(impressora)
+        if transporte['tipo'] != 'tcp':
+            return None
+
+        pool = obter_pool(transporte['host'], int(transporte.get('porta', PORTA_RAW_PADRAO)))
+        try:
+            status = interpretar_status_hs(pool.consultar(b"~HS"))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._falhas[impressora] = self._falhas.get(impressora, 0) + 1
+                if self._falhas[impressora] < self.FALHAS_SEM_COMUNICACAO:
+                    print(f"⚠️ ~HS sem resposta de '{impressora}' ({self._falhas[impressora]}x): {e}")
+                    anterior = self._status.get(impressora)
+                    return dict(anterior) if anterior else None
+            status = {
+                'ok': False,
+                'problemas': ["Sem comunicação"],
+                'buffer_cheio': False,
+                'formatos_no_buffer': 0,
+                'etiquetas_restantes': 0,
+                'timestamp': time.time(),
+                'erro': str(e),
+            }
+
+        with self._lock:
+            if status['erro'] is None:
+                self._falhas.pop(impressora, None)
+            self._status[impressora] = status
+        self.status_atualizado.emit(impressora, dict(status))
+        return status
+
+    def _impressoras_monitoradas(self):
+        transportes = self.settings_manager.current_config.get('transportes', {})
+        return [nome for nome, transporte in transportes.items() if transporte.get('tipo') == 'tcp']
+
+    def _executar(self):
+        while not self._parar.is_set():
+            for impressora in self._impressoras_monitoradas():
+                if self._parar.is_set():
+                    break
+                self.consultar(impressora)
+            self._parar.wait(self.intervalo)
@@ -2,6 +2,11 @@ import platform
 import subprocess
 import tempfile
 import os
+import time
+
+from core.transporte_rede import obter_pool, PORTA_RAW_PADRAO
+from core.registro_impressoras import RegistroImpressoras
+from core.seletor_transporte import SeletorTransporte
 
 try:
     if platform.system() == "Windows":
@@ -14,41 +19,47 @@ except ImportError:
     WIN32_AVAILABLE = False
 
 class PrinterManager:
-    def __init__(self, settings_manager):
+    def __init__(self, settings_manager, registro=None, monitor=None):
         self.settings_manager = settings_manager
-        self.impressoras_disponiveis = self.listar_impressoras()
+        
+        # Monitor de status (~HS) opcional: cache de saúde usado na checagem antes do envio
+        self.monitor = monitor
+        
+        # Registro compartilhado de impressoras; sem ele, descobre na hora (bloqueante)
+        if registro is None:
+            registro = RegistroImpressoras()
+            registro.atualizar()
+        self.registro = registro
+        
+        # Histórico de métodos de envio por impressora (último que funcionou + circuit breaker)
+        self.seletor_transporte = SeletorTransporte()
+        
+        # Formatos armazenados (^DF) já enviados: {impressora: {nome: assinatura}}
+        self.formatos_carregados = {}
+        # Conexões TCP abertas para a impressora quando os formatos foram registrados:
+        # uma conexão nova pode ser uma impressora reiniciada, sem os formatos na memória
+        self._conexoes_formatos = {}
+    
+    @property
+    def impressoras_disponiveis(self):
+        """Impressoras conhecidas (cache do registro, nunca bloqueia)"""
+        return self.registro.listar()
     
     def listar_impressoras(self):
         """Lista impressoras disponíveis"""
-        impressoras = []
-        
-        try:
-            if WIN32_AVAILABLE:
-                # Windows
-                printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL)
-                for printer in printers:
-                    impressoras.append(printer[2])
-            else:
-                # Linux/macOS
-                try:
-                    result = subprocess.run(['lpstat', '-p'], 
-                                          capture_output=True, text=True, check=True)
-                    for line in result.stdout.split('\n'):
-                        if line.startswith('printer'):
-                            printer_name = line.split()[1]
-                            impressoras.append(printer_name)
-                except:
-                    impressoras = ["Impressora Padrão"]
-        except:
-            impressoras = ["Nenhuma impressora encontrada"]
-        
-        print(f"🖨️ Impressoras encontradas: {impressoras}")
-        return impressoras
+        return self.registro.listar()
     
-    def imprimir(self, zpl_code):
-        """Imprime código ZPL"""
-        # Forçar recarregamento da configuração
-        impressora_nome = self.settings_manager.get_printer_name()
+    def imprimir(self, zpl_code, formatos=None, impressora_nome=None):
+        """Imprime código ZPL (um stream, mesmo com várias etiquetas, vira um único job)
+        
+        `formatos` é o dict {nome: (assinatura, zpl_df)} gerado por
+        ZPLGenerator.gerar_zpl_lote_armazenado; os ^DF que a impressora ainda não
+        tem (ou tem em versão antiga) são enviados no mesmo job, antes das etiquetas.
+        Sem `impressora_nome`, usa a impressora configurada.
+        """
+        # Forçar recarregamento da configuração (se o job não fixou a impressora)
+        if impressora_nome is None:
+            impressora_nome = self.settings_manager.get_printer_name()
         
         # Debug detalhado
         print(f"🐛 === DEBUG IMPRESSÃO ===")
@@ -74,77 +85,183 @@ class PrinterManager:
             print(f"📋 Lista atual: {self.impressoras_disponiveis}")
             print(f"🔄 Tentando imprimir mesmo assim...")
         
+        if formatos:
+            pool = self._pool_tcp(impressora_nome)
+            conexoes = pool.conexoes_abertas if pool else None
+            nova_conexao = pool is not None and (
+                not pool.tem_conexao_ociosa() or self._conexoes_formatos.get(impressora_nome) != conexoes
+            )
+            if nova_conexao and impressora_nome in self.formatos_carregados:
+                print(f"🔌 Nova conexão com '{impressora_nome}': formatos armazenados serão reenviados")
+                self.invalidar_formatos(impressora_nome)
+            
+            pendentes = self._formatos_pendentes(impressora_nome, formatos)
+            if pendentes:
+                print(f"📥 Enviando {len(pendentes)} formato(s) armazenado(s) para '{impressora_nome}'")
+                zpl_code = "\n".join([formatos[nome][1] for nome in pendentes] + [zpl_code])
+        
         try:
             result = self._enviar_para_impressora(impressora_nome, zpl_code)
+            if formatos:
+                registrados = formatos
+                if pool is not None and not nova_conexao and pool.conexoes_abertas != conexoes:
+                    # Reconectou durante o envio: só os formatos deste job certamente estão na impressora
+                    self.invalidar_formatos(impressora_nome)
+                    registrados = {nome: formatos[nome] for nome in pendentes}
+                carregados = self.formatos_carregados.setdefault(impressora_nome, {})
+                for nome, (assinatura, _) in registrados.items():
+                    carregados[nome] = assinatura
+                if pool is not None:
+                    self._conexoes_formatos[impressora_nome] = pool.conexoes_abertas
             print(f"✅ Resultado da impressão: {result}")
             return result
         except Exception as e:
+            # Estado da memória da impressora é incerto: reenviar formatos no próximo job
+            self.invalidar_formatos(impressora_nome)
             error_msg = f"❌ Erro ao imprimir na impressora '{impressora_nome}': {str(e)}"
             print(error_msg)
             raise Exception(error_msg)
     
+    def _formatos_pendentes(self, impressora_nome, formatos):
+        """Retorna os nomes dos formatos que a impressora não possui na versão atual"""
+        carregados = self.formatos_carregados.get(impressora_nome, {})
+        return [
+            nome for nome, (assinatura, _) in formatos.items()
+            if carregados.get(nome) != assinatura
+        ]
+    
+    def _pool_tcp(self, impressora_nome):
+        """Pool de conexões da impressora de rede (None se o transporte não é TCP)"""
+        transporte = self.settings_manager.get_transporte_impressora(impressora_nome)
+        if transporte['tipo'] != 'tcp':
+            return None
+        return obter_pool(transporte['host'], int(transporte.get('porta', PORTA_RAW_PADRAO)))
+    
+    def invalidar_formatos(self, impressora_nome=None):
+        """Esquece os formatos armazenados (ex: impressora reiniciada, memória R: apagada)"""
+        if impressora_nome is None:
+            self.formatos_carregados.clear()
+            self._conexoes_formatos.clear()
+        else:
+            self.formatos_carregados.pop(impressora_nome, None)
+            self._conexoes_formatos.pop(impressora_nome, None)
+    
     def _enviar_para_impressora(self, impressora_nome, zpl_code):
         """Envia ZPL para impressora específica"""
-        sucesso = False
-        
         print(f"📤 Enviando para impressora: '{impressora_nome}'")
         print(f"📄 Tamanho do ZPL: {len(zpl_code)} caracteres")
         
-        # Método 1: win32print (Windows)
-        if WIN32_AVAILABLE and platform.system() == "Windows":
+        metodos = self._metodos_envio(impressora_nome)
+        ordem = self.seletor_transporte.ordenar(impressora_nome, list(metodos))
+        if not ordem:
+            raise Exception(
+                f"Todos os métodos de envio para '{impressora_nome}' estão suspensos após falhas "
+                f"seguidas. Verifique a impressora (aba Configurações > Debug)."
+            )
+        
+        erros = []
+        for nome_metodo in ordem:
+            inicio = time.perf_counter()
             try:
-                print("🖨️ Tentando método win32print...")
-                printer_handle = win32print.OpenPrinter(impressora_nome)
-                try:
-                    job_info = ("Etiqueta", None, "RAW")
-                    job_id = win32print.StartDocPrinter(printer_handle, 1, job_info)
-                    try:
-                        win32print.StartPagePrinter(printer_handle)
-                        win32print.WritePrinter(printer_handle, zpl_code.encode('utf-8'))
-                        win32print.EndPagePrinter(printer_handle)
-                        sucesso = True
-                        print("✅ Impressão enviada via win32print")
-                    finally:
-                        win32print.EndDocPrinter(printer_handle)
-                finally:
-                    win32print.ClosePrinter(printer_handle)
+                print(f"🖨️ Tentando método {nome_metodo}...")
+                metodos[nome_metodo](impressora_nome, zpl_code)
             except Exception as e:
-                print(f"❌ Erro com win32print: {e}")
+                print(f"❌ Erro com {nome_metodo}: {e}")
+                self.seletor_transporte.registrar_falha(impressora_nome, nome_metodo, e)
+                erros.append(f"{nome_metodo}: {e}")
+                continue
+            
+            duracao = time.perf_counter() - inicio
+            self.seletor_transporte.registrar_sucesso(impressora_nome, nome_metodo, duracao)
+            print(f"✅ Impressão enviada via {nome_metodo} ({duracao * 1000:.0f} ms)")
+            return True
+        
+        raise Exception(f"Falha em todos os métodos de impressão ({'; '.join(erros)})")
+    
+    def _metodos_envio(self, impressora_nome):
+        """Métodos de envio possíveis para a impressora: {nome: função(impressora, zpl)}"""
+        # Transporte escolhido para a impressora (padrão: spooler do sistema)
+        transporte = self.settings_manager.get_transporte_impressora(impressora_nome)
+        
+        if transporte['tipo'] == 'tcp':
+            # Impressora de rede: raw TCP direto na porta 9100, conexão reaproveitada
+            pool = obter_pool(transporte['host'], int(transporte.get('porta', PORTA_RAW_PADRAO)))
+            return {'tcp': lambda impressora, zpl: pool.enviar(zpl.encode('utf-8'))}
+        
+        if transporte['tipo'] == 'lp':
+            return {'lp': lambda impressora, zpl: self._enviar_lp_stdin(impressora, zpl.encode('utf-8'))}
+        
+        if transporte['tipo'] == 'dispositivo':
+            caminho = transporte['caminho']
+            return {'dispositivo': lambda impressora, zpl: self._enviar_dispositivo(caminho, zpl.encode('utf-8'))}
+        
+        metodos = {}
+        
+        # Método 1: win32print (Windows)
+        if WIN32_AVAILABLE and platform.system() == "Windows":
+            metodos['win32print'] = self._enviar_win32print
         
         # Método 2: Comando do sistema (fallback)
-        if not sucesso:
-            try:
-                print("🖨️ Tentando método de comando do sistema...")
-                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt') as temp_file:
-                    temp_file.write(zpl_code)
-                    temp_file_path = temp_file.name
-                
-                if platform.system() == "Windows":
-                    cmd = f'copy "{temp_file_path}" "\\\\localhost\\{impressora_nome}"'
-                    subprocess.run(cmd, shell=True, check=True)
-                elif platform.system() == "Linux":
-                    cmd = f'lp -d "{impressora_nome}" "{temp_file_path}"'
-                    subprocess.run(cmd.split(), check=True)
-                elif platform.system() == "Darwin":  # macOS
-                    cmd = f'lp -d "{impressora_nome}" "{temp_file_path}"'
-                    subprocess.run(cmd.split(), check=True)
-                
-                os.unlink(temp_file_path)
-                sucesso = True
-                print("✅ Impressão enviada via comando do sistema")
-                
-            except Exception as e:
-                print(f"❌ Erro com comando do sistema: {e}")
+        if platform.system() == "Windows":
+            metodos['comando'] = self._enviar_copy_windows
+        else:
+            # Linux/macOS: bytes direto no stdin do lp, sem arquivo temporário
+            metodos['comando'] = lambda impressora, zpl: self._enviar_lp_stdin(impressora, zpl.encode('utf-8'))
         
-        if not sucesso:
-            raise Exception("Falha em todos os métodos de impressão")
+        return metodos
+    
+    def _enviar_win32print(self, impressora_nome, zpl_code):
+        """Envia job RAW pelo spooler do Windows"""
+        printer_handle = win32print.OpenPrinter(impressora_nome)
+        try:
+            nome_job = "Lote de etiquetas" if zpl_code.count("^XA") > 1 or "^PQ" in zpl_code else "Etiqueta"
+            job_info = (nome_job, None, "RAW")
+            win32print.StartDocPrinter(printer_handle, 1, job_info)
+            try:
+                win32print.StartPagePrinter(printer_handle)
+                win32print.WritePrinter(printer_handle, zpl_code.encode('utf-8'))
+                win32print.EndPagePrinter(printer_handle)
+            finally:
+                win32print.EndDocPrinter(printer_handle)
+        finally:
+            win32print.ClosePrinter(printer_handle)
+    
+    def _enviar_lp_stdin(self, impressora_nome, dados):
+        """Envia bytes pelo stdin do lp em modo raw (sem arquivo temporário)"""
+        resultado = subprocess.run(
+            ['lp', '-d', impressora_nome, '-o', 'raw'],
+            input=dados, capture_output=True
+        )
+        if resultado.returncode != 0:
+            erro = resultado.stderr.decode('utf-8', 'replace').strip()
+            raise Exception(f"lp retornou {resultado.returncode}: {erro}")
+    
+    def _enviar_dispositivo(self, caminho, dados):
+        """Escreve direto no nó de dispositivo da impressora (ex: /dev/usb/lp0)"""
+        with open(caminho, 'wb', buffering=0) as dispositivo:
+            dispositivo.write(dados)
+    
+    def _enviar_copy_windows(self, impressora_nome, zpl_code):
+        """Copia arquivo para o compartilhamento da impressora (Windows sem win32print)"""
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt') as temp_file:
+            temp_file.write(zpl_code)
+            temp_file_path = temp_file.name
         
-        return sucesso
+        try:
+            cmd = f'copy /b "{temp_file_path}" "\\\\localhost\\{impressora_nome}"'
+            subprocess.run(cmd, shell=True, check=True)
+        finally:
+            os.unlink(temp_file_path)
     
     def testar_impressora(self, impressora_nome):
         """Testa impressora com etiqueta de teste"""
         print(f"🧪 Testando impressora: '{impressora_nome}'")
         
+        # Teste costuma seguir um reinício/ajuste da impressora: reenviar formatos
+        # e dar nova chance a métodos suspensos
+        self.invalidar_formatos(impressora_nome)
+        self.seletor_transporte.resetar(impressora_nome)
+        
         zpl_teste = """^XA
 ^MMT
 ^PW472
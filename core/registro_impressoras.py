@@ -0,0 +1,114 @@
+import platform
+import subprocess
+import threading
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+try:
+    if platform.system() == "Windows":
+        import win32print
+        WIN32_AVAILABLE = True
+    else:
+        WIN32_AVAILABLE = False
+except ImportError:
+    WIN32_AVAILABLE = False
+
+
+def descobrir_impressoras():
+    """Lista impressoras instaladas no sistema (lento: lpstat/EnumPrinters)"""
+    impressoras = []
+
+    try:
+        if WIN32_AVAILABLE:
+            # Windows
+            printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL)
+            for printer in printers:
+                impressoras.append(printer[2])
+        else:
+            # Linux/macOS
+            try:
+                result = subprocess.run(['lpstat', '-p'],
+                                        capture_output=True, text=True, check=True)
+                for line in result.stdout.split('\n'):
+                    if line.startswith('printer'):
+                        printer_name = line.split()[1]
+                        impressoras.append(printer_name)
+            except:
+                impressoras = ["Impressora Padrão"]
+    except:
+        impressoras = ["Nenhuma impressora encontrada"]
+
+    print(f"🖨️ Impressoras encontradas: {impressoras}")
+    return impressoras
+
+
+class RegistroImpressoras(QObject):
+    """Lista de impressoras compartilhada, com cache e atualização em segundo plano
+
+    A descoberta roda numa thread própria a cada `ttl` segundos; quem consulta
+    recebe sempre a lista em cache, sem bloquear a interface. Quando
+    impressoras aparecem ou somem, o sinal `impressoras_alteradas` é emitido.
+    """
+
+    impressoras_alteradas = pyqtSignal(list)
+
+    def __init__(self, ttl=60.0):
+        super().__init__()
+        self.ttl = ttl
+        self._impressoras = []
+        self._atualizado_em = None
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        """Inicia a descoberta periódica em segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="RegistroImpressoras", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def listar(self):
+        """Retorna a lista em cache (vazia até a primeira descoberta terminar)"""
+        with self._lock:
+            return list(self._impressoras)
+
+    def idade(self):
+        """Segundos desde a última descoberta (None se nunca rodou)"""
+        with self._lock:
+            if self._atualizado_em is None:
+                return None
+            return time.monotonic() - self._atualizado_em
+
+    def atualizar_agora(self):
+        """Pede uma nova descoberta sem esperar o TTL"""
+        self._acordar.set()
+
+    def atualizar(self):
+        """Roda a descoberta na thread atual e atualiza o cache"""
+        impressoras = descobrir_impressoras()
+
+        with self._lock:
+            mudou = impressoras != self._impressoras
+            self._impressoras = impressoras
+            self._atualizado_em = time.monotonic()
+
+        if mudou:
+            self.impressoras_alteradas.emit(list(impressoras))
+        return impressoras
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                self.atualizar()
+            except Exception as e:
+                print(f"⚠️ Erro na descoberta de impressoras: {e}")
+            self._acordar.wait(self.ttl)
+            self._acordar.clear()
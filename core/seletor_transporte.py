@@ -0,0 +1,104 @@
+import threading
+import time
+
+
+class EstatisticasMetodo:
+    """Histórico de um método de envio para uma impressora"""
+
+    def __init__(self):
+        self.sucessos = 0
+        self.falhas = 0
+        self.falhas_seguidas = 0
+        self.tempo_medio = None      # Média móvel exponencial (segundos)
+        self.ultimo_erro = None
+        self.aberto_ate = 0.0        # Circuito aberto (método pulado) até este instante
+
+    def circuito_aberto(self, agora):
+        return agora < self.aberto_ate
+
+
+class SeletorTransporte:
+    """Escolhe o método de envio por impressora com base no histórico
+
+    O último método que funcionou é tentado primeiro. Após LIMITE_FALHAS
+    falhas seguidas o método é pulado (circuito aberto) por TEMPO_ESPERA
+    segundos; depois disso volta a ser tentado uma vez (meio-aberto).
+    """
+
+    LIMITE_FALHAS = 3
+    TEMPO_ESPERA = 60.0
+    PESO_MEDIA = 0.3
+
+    def __init__(self):
+        self._estatisticas = {}   # (impressora, metodo) -> EstatisticasMetodo
+        self._preferido = {}      # impressora -> último método com sucesso
+        self._lock = threading.Lock()
+
+    def ordenar(self, impressora, metodos):
+        """Retorna os métodos na ordem de tentativa, sem os de circuito aberto"""
+        agora = time.monotonic()
+        with self._lock:
+            preferido = self._preferido.get(impressora)
+            ordem = sorted(metodos, key=lambda metodo: metodo != preferido)
+            return [
+                metodo for metodo in ordem
+                if not self._obter(impressora, metodo).circuito_aberto(agora)
+            ]
+
+    def registrar_sucesso(self, impressora, metodo, duracao):
+        with self._lock:
+            estatisticas = self._obter(impressora, metodo)
+            estatisticas.sucessos += 1
+            estatisticas.falhas_seguidas = 0
+            estatisticas.aberto_ate = 0.0
+            if estatisticas.tempo_medio is None:
+                estatisticas.tempo_medio = duracao
+            else:
+                estatisticas.tempo_medio += self.PESO_MEDIA * (duracao - estatisticas.tempo_medio)
+            self._preferido[impressora] = metodo
+
+    def registrar_falha(self, impressora, metodo, erro):
+        with self._lock:
+            estatisticas = self._obter(impressora, metodo)
+            estatisticas.falhas += 1
+            estatisticas.falhas_seguidas += 1
+            estatisticas.ultimo_erro = str(erro)
+            if estatisticas.falhas_seguidas >= self.LIMITE_FALHAS:
+                estatisticas.aberto_ate = time.monotonic() + self.TEMPO_ESPERA
+                print(f"⛔ Método '{metodo}' suspenso por {self.TEMPO_ESPERA:.0f}s para '{impressora}'")
+            if self._preferido.get(impressora) == metodo:
+                del self._preferido[impressora]
+
+    def resetar(self, impressora=None):
+        """Esquece o histórico (ex: após trocar cabo ou configuração)"""
+        with self._lock:
+            if impressora is None:
+                self._estatisticas.clear()
+                self._preferido.clear()
+                return
+            for chave in [chave for chave in self._estatisticas if chave[0] == impressora]:
+                del self._estatisticas[chave]
+            self._preferido.pop(impressora, None)
+
+    def diagnostico(self):
+        """Texto com o histórico de cada impressora/método"""
+        agora = time.monotonic()
+        linhas = []
+        with self._lock:
+            for (impressora, metodo), estatisticas in sorted(self._estatisticas.items()):
+                marcador = "⭐" if self._preferido.get(impressora) == metodo else "  "
+                tempo = f"{estatisticas.tempo_medio * 1000:.0f} ms" if estatisticas.tempo_medio is not None else "-"
+                linha = (f"{marcador} {impressora} / {metodo}: {estatisticas.sucessos} ok, "
+                         f"{estatisticas.falhas} falha(s), média {tempo}")
+                if estatisticas.circuito_aberto(agora):
+                    linha += f" — suspenso por mais {estatisticas.aberto_ate - agora:.0f}s"
+                if estatisticas.ultimo_erro:
+                    linha += f"\n      último erro: {estatisticas.ultimo_erro}"
+                linhas.append(linha)
+        return "\n".join(linhas) if linhas else "Nenhum envio registrado"
+
+    def _obter(self, impressora, metodo):
+        chave = (impressora, metodo)
+        if chave not in self._estatisticas:
+            self._estatisticas[chave] = EstatisticasMetodo()
+        return self._estatisticas[chave]
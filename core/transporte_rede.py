@@ -0,0 +1,159 @@
+import select
+import socket
+import threading
+
+PORTA_RAW_PADRAO = 9100
+
+
+class PoolConexoesTCP:
+    """Pool de conexões persistentes (raw TCP, porta 9100) para uma impressora de rede"""
+
+    def __init__(self, host, porta=PORTA_RAW_PADRAO, max_conexoes=2, timeout=5.0):
+        self.host = host
+        self.porta = porta
+        self.timeout = timeout
+
+        self._livres = []
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(max_conexoes)
+
+        # Estatísticas simples para diagnóstico
+        self.conexoes_abertas = 0
+        self.reconexoes = 0
+
+    def enviar(self, dados, tentativas=2):
+        """Envia bytes reaproveitando uma conexão; reconecta se ela caiu
+
+        Só tenta de novo se a falha veio antes de qualquer byte sair: depois
+        disso a impressora pode já ter recebido (e impresso) parte do job, e
+        reenviar tudo duplicaria etiquetas. "Sair" aqui é ser aceito pelo
+        sistema operacional; uma conexão morta que ainda aceitou os bytes só
+        aparece como erro no envio seguinte.
+        """
+        ultimo_erro = None
+
+        for tentativa in range(tentativas):
+            with self._vagas:
+                sock = self._obter_conexao()
+                enviados = 0
+                try:
+                    while enviados < len(dados):
+                        enviados += sock.send(dados[enviados:])
+                except OSError as e:
+                    self._fechar(sock)
+                    if enviados:
+                        raise ConnectionError(
+                            f"Envio para {self.host}:{self.porta} interrompido depois de {enviados} de "
+                            f"{len(dados)} bytes ({e}); não reenviado para não duplicar etiquetas"
+                        )
+                    ultimo_erro = e
+                    self.reconexoes += 1
+                    print(f"⚠️ Conexão com {self.host}:{self.porta} falhou ({e}), reconectando...")
+                    continue
+                self._devolver(sock)
+                return True
+
+        raise ConnectionError(f"Falha ao enviar para {self.host}:{self.porta}: {ultimo_erro}")
+
+    def consultar(self, comando, frames=3, timeout=2.0):
+        """Envia um comando de consulta (ex: ~HS) e lê a resposta até `frames` blocos STX..ETX"""
+        with self._vagas:
+            sock = self._obter_conexao()
+            try:
+                sock.settimeout(timeout)
+                sock.sendall(comando)
+                resposta = b""
+                while resposta.count(b"\x03") < frames:
+                    dados = sock.recv(1024)
+                    if not dados:
+                        raise ConnectionError("Conexão encerrada pela impressora")
+                    resposta += dados
+            except OSError as e:
+                self._fechar(sock)
+                raise ConnectionError(f"Sem resposta de {self.host}:{self.porta}: {e}")
+            sock.settimeout(self.timeout)
+            self._devolver(sock)
+            return resposta
+
+    def tem_conexao_ociosa(self):
+        """Há uma conexão ociosa viva, ou seja, o próximo envio não abre uma nova?"""
+        with self._lock:
+            vivas = [sock for sock in self._livres if self._conexao_viva(sock)]
+            for sock in self._livres:
+                if sock not in vivas:
+                    self._fechar(sock)
+            self._livres = vivas
+            return bool(vivas)
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas"""
+        with self._lock:
+            livres, self._livres = self._livres, []
+        for sock in livres:
+            self._fechar(sock)
+
+    def _obter_conexao(self):
+        """Retorna uma conexão ociosa ainda viva ou abre uma nova"""
+        while True:
+            with self._lock:
+                sock = self._livres.pop() if self._livres else None
+            if sock is None:
+                return self._conectar()
+            if self._conexao_viva(sock):
+                return sock
+            self._fechar(sock)
+
+    def _devolver(self, sock):
+        with self._lock:
+            self._livres.append(sock)
+
+    def _conectar(self):
+        sock = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.conexoes_abertas += 1
+        print(f"🔌 Conectado a {self.host}:{self.porta}")
+        return sock
+
+    @staticmethod
+    def _conexao_viva(sock):
+        """Detecta conexões fechadas pela impressora enquanto estavam ociosas"""
+        try:
+            legivel, _, _ = select.select([sock], [], [], 0)
+            if not legivel:
+                return True
+            # Legível sem dados = o outro lado encerrou; com dados = resposta antiga, descartar
+            return sock.recv(4096) != b""
+        except OSError:
+            return False
+
+    @staticmethod
+    def _fechar(sock):
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+
+# Pools compartilhados por endereço, para reaproveitar conexões entre jobs
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obter_pool(host, porta=PORTA_RAW_PADRAO):
+    """Retorna o pool de conexões do endereço, criando se necessário"""
+    with _pools_lock:
+        pool = _pools.get((host, porta))
+        if pool is None:
+            pool = PoolConexoesTCP(host, porta)
+            _pools[(host, porta)] = pool
+        return pool
+
+
+def fechar_pools():
+    """Fecha as conexões de todos os pools (ao encerrar a aplicação)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.fechar()
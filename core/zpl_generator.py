@@ -1,87 +1,242 @@
 from datetime import datetime
+from functools import lru_cache
 import unicodedata
-import re
+import zlib
+
+# Mapeamento de caracteres especiais para equivalentes ASCII
+_SUBSTITUICOES_ZPL = {
+    'ç': 'c', 'Ç': 'C',
+    'ã': 'a', 'Ã': 'A',
+    'à': 'a', 'À': 'A',
+    'á': 'a', 'Á': 'A',
+    'â': 'a', 'Â': 'A',
+    'ä': 'a', 'Ä': 'A',
+    'é': 'e', 'É': 'E',
+    'è': 'e', 'È': 'E',
+    'ê': 'e', 'Ê': 'E',
+    'ë': 'e', 'Ë': 'E',
+    'í': 'i', 'Í': 'I',
+    'ì': 'i', 'Ì': 'I',
+    'î': 'i', 'Î': 'I',
+    'ï': 'i', 'Ï': 'I',
+    'ó': 'o', 'Ó': 'O',
+    'ò': 'o', 'Ò': 'O',
+    'ô': 'o', 'Ô': 'O',
+    'õ': 'o', 'Õ': 'O',
+    'ö': 'o', 'Ö': 'O',
+    'ú': 'u', 'Ú': 'U',
+    'ù': 'u', 'Ù': 'U',
+    'û': 'u', 'Û': 'U',
+    'ü': 'u', 'Ü': 'U',
+    'ñ': 'n', 'Ñ': 'N',
+    '°': ' graus',
+    '²': '2',
+    '³': '3',
+    '½': '1/2',
+    '¼': '1/4',
+    '¾': '3/4',
+    '–': '-',
+    '—': '-',
+    '\u2018': "'",
+    '\u2019': "'",
+    '\u201c': '"',
+    '\u201d': '"',
+    '…': '...',
+}
+
+# Tabela de str.translate: substituições + remoção de caracteres de controle (fora de \x20-\x7E)
+_TABELA_ZPL = str.maketrans(_SUBSTITUICOES_ZPL)
+_TABELA_ZPL.update({codigo: None for codigo in range(0x20)})
+_TABELA_ZPL[0x7F] = None
+
+# Resolução das impressoras (pontos por polegada) usada para estimar o tempo de impressão
+DPI_IMPRESSORA = 203
+
+
+@lru_cache(maxsize=4096)
+def sanitizar_texto_zpl(texto):
+    """Sanitiza texto para ZPL (memoizado: descrições se repetem muito no turno)"""
+    texto_sanitizado = texto.translate(_TABELA_ZPL)
+    
+    if not texto_sanitizado.isascii():
+        # Remover caracteres não ASCII restantes
+        texto_sanitizado = unicodedata.normalize('NFKD', texto_sanitizado)
+        texto_sanitizado = texto_sanitizado.encode('ascii', 'ignore').decode('ascii')
+        texto_sanitizado = texto_sanitizado.translate(_TABELA_ZPL)
+    
+    return texto_sanitizado
+
+
+class TemplateZPL:
+    """Etiqueta pré-compilada: trechos fixos intercalados com campos variáveis"""
+    
+    def __init__(self, trechos, campos):
+        self.trechos = trechos
+        self.campos = campos
+        
+        # String de formatação com um slot ^FD por campo
+        formato = ""
+        for i, trecho in enumerate(trechos):
+            formato += trecho.replace('{', '{{').replace('}', '}}')
+            if i < len(campos):
+                formato += "^FD{}"
+        self._formato = formato
+        self._formatos_armazenados = {}
+    
+    def renderizar(self, valores):
+        """Gera o ZPL com os valores na ordem de self.campos"""
+        return self._formato.format(*valores)
+    
+    def formato_armazenado(self, nome):
+        """Retorna (assinatura, zpl) que grava o layout na impressora com ^DF
+        
+        Os campos variáveis viram ^FN1..^FNn; a assinatura muda junto com o layout.
+        """
+        if nome not in self._formatos_armazenados:
+            corpo = ""
+            for i, trecho in enumerate(self.trechos):
+                corpo += trecho
+                if i < len(self.campos):
+                    corpo += f"^FN{i + 1}"
+            zpl = corpo.replace("^XA\n", f"^XA\n^DF{nome}^FS\n", 1)
+            assinatura = f"{zlib.crc32(zpl.encode('ascii')):08x}"
+            self._formatos_armazenados[nome] = (assinatura, zpl)
+        return self._formatos_armazenados[nome]
+    
+    def renderizar_recall(self, nome, valores):
+        """Gera o ZPL que chama o formato armazenado (^XF) enviando só os campos"""
+        campos = "".join(f"^FN{i + 1}^FD{valor}^FS\n" for i, valor in enumerate(valores))
+        return f"^XA\n^XF{nome}^FS\n{campos}^XZ"
+
 
 class ZPLGenerator:
+    # Texto fixo de conservação das sopas (quebrado manualmente)
+    LINHAS_CONSERVACAO = [
+        "Conservacao: -10 a -18 graus",
+        "ou mais frio.",
+        "Validade apos descongelamento:",
+        "5 dias"
+    ]
+    
     def __init__(self, settings_manager):
         self.settings_manager = settings_manager
+        
+        # Templates compilados por (tipo, nº de linhas da descrição)
+        self._templates = {}
+        self._versao_templates = None
     
     def gerar_zpl(self, dados):
         """Gera código ZPL baseado no tipo de etiqueta"""
-        if dados['tipo'] == 'sopa':
-            return self._gerar_zpl_sopa(dados)
-        else:
-            return self._gerar_zpl_normal(dados)
+        return self._renderizar(dados, datetime.now().strftime('%d/%m/%Y %H:%M'))
+    
+    def gerar_zpl_lote(self, itens):
+        """Gera um único stream ZPL para um lote de etiquetas
+        
+        Cada item é um dict de dados com a chave opcional 'quantidade'.
+        Etiquetas idênticas viram um só formato com ^PQ; diferentes são concatenadas.
+        """
+        return self.montar_stream(self.gerar_blocos_lote(itens))
+    
+    def gerar_zpl_lote_armazenado(self, itens):
+        """Gera o lote usando formatos armazenados na impressora (^DF/^XF)
+        
+        Retorna (zpl, formatos): o stream só com ^XF + valores dos campos e o dict
+        {nome: (assinatura, zpl_df)} dos formatos que a impressora precisa ter.
+        Cabe ao PrinterManager enviar os ^DF que a impressora ainda não possui.
+        """
+        formatos = {}
+        blocos = self.gerar_blocos_lote(itens, formatos)
+        return self.montar_stream(blocos), formatos
+    
+    def gerar_blocos_lote(self, itens, formatos=None):
+        """Agrupa o lote em blocos (zpl, quantidade) sem repetir etiquetas idênticas
+        
+        Se `formatos` for um dict, os blocos chamam formatos armazenados e o dict
+        é preenchido com os ^DF necessários.
+        """
+        data_impressao = datetime.now().strftime('%d/%m/%Y %H:%M')
+        blocos = {}
+        
+        for dados in itens:
+            quantidade = int(dados.get('quantidade', 1))
+            if quantidade <= 0:
+                continue
+            
+            template, valores = self._preparar(dados, data_impressao)
+            if formatos is None:
+                zpl = template.renderizar(valores)
+            else:
+                nome = self._nome_formato(dados['tipo'], len(template.campos))
+                formatos[nome] = template.formato_armazenado(nome)
+                zpl = template.renderizar_recall(nome, valores)
+            blocos[zpl] = blocos.get(zpl, 0) + quantidade
+        
+        return list(blocos.items())
+    
+    @staticmethod
+    def _nome_formato(tipo, n_campos):
+        """Nome do formato na memória da impressora (ex: R:NORMAL5.ZPL)"""
+        prefixo = "SOPA" if tipo == 'sopa' else "NORMAL"
+        return f"R:{prefixo}{n_campos}.ZPL"
+    
+    @staticmethod
+    def tempo_por_etiqueta(altura_pontos, velocidade):
+        """Segundos estimados para imprimir uma etiqueta (^LL em pontos, ^PR em pol/s)"""
+        return altura_pontos / DPI_IMPRESSORA / velocidade
+    
+    @staticmethod
+    def montar_stream(blocos):
+        """Concatena blocos (zpl, quantidade) inserindo ^PQ antes do ^XZ"""
+        partes = []
+        for zpl, quantidade in blocos:
+            if quantidade > 1:
+                zpl = f"{zpl[:-3]}^PQ{quantidade}\n^XZ"
+            partes.append(zpl)
+        return "\n".join(partes)
     
     def _sanitizar_texto_zpl(self, texto):
         """Sanitiza texto para impressoras Zebra ZPL"""
         if not texto:
             return ""
+        return sanitizar_texto_zpl(texto)
+    
+    def _renderizar(self, dados, data_impressao):
+        """Preenche o template compilado apenas com os campos variáveis"""
+        template, valores = self._preparar(dados, data_impressao)
+        return template.renderizar(valores)
+    
+    def _preparar(self, dados, data_impressao):
+        """Retorna o template compilado e os valores dos campos variáveis"""
+        linhas_descricao = self._quebrar_texto(self._sanitizar_texto_zpl(dados['descricao']), 30)
+        template = self._obter_template(dados['tipo'], len(linhas_descricao))
         
-        # Mapeamento de caracteres especiais para equivalentes ASCII
-        substituicoes = {
-            'ç': 'c', 'Ç': 'C',
-            'ã': 'a', 'Ã': 'A',
-            'à': 'a', 'À': 'A',
-            'á': 'a', 'Á': 'A',
-            'â': 'a', 'Â': 'A',
-            'ä': 'a', 'Ä': 'A',
-            'é': 'e', 'É': 'E',
-            'è': 'e', 'È': 'E',
-            'ê': 'e', 'Ê': 'E',
-            'ë': 'e', 'Ë': 'E',
-            'í': 'i', 'Í': 'I',
-            'ì': 'i', 'Ì': 'I',
-            'î': 'i', 'Î': 'I',
-            'ï': 'i', 'Ï': 'I',
-            'ó': 'o', 'Ó': 'O',
-            'ò': 'o', 'Ò': 'O',
-            'ô': 'o', 'Ô': 'O',
-            'õ': 'o', 'Õ': 'O',
-            'ö': 'o', 'Ö': 'O',
-            'ú': 'u', 'Ú': 'U',
-            'ù': 'u', 'Ù': 'U',
-            'û': 'u', 'Û': 'U',
-            'ü': 'u', 'Ü': 'U',
-            'ñ': 'n', 'Ñ': 'N',
-            '°': ' graus',
-            '²': '2',
-            '³': '3',
-            '½': '1/2',
-            '¼': '1/4',
-            '¾': '3/4',
-            '–': '-',
-            '—': '-',
-            ''': "'",
-            ''': "'",
-            '"': '"',
-            '"': '"',
-            '…': '...',
-        }
-        
-        # Aplicar substituições
-        texto_sanitizado = texto
-        for char_especial, char_ascii in substituicoes.items():
-            texto_sanitizado = texto_sanitizado.replace(char_especial, char_ascii)
-        
-        # Remover caracteres não ASCII restantes
-        texto_sanitizado = unicodedata.normalize('NFKD', texto_sanitizado)
-        texto_sanitizado = texto_sanitizado.encode('ascii', 'ignore').decode('ascii')
-        
-        # Remover caracteres problemáticos para ZPL
-        texto_sanitizado = re.sub(r'[^\x20-\x7E]', '', texto_sanitizado)
+        valores = [f"Codigo: {self._sanitizar_texto_zpl(dados['codigo'])}"]
+        valores.extend(linhas_descricao)
+        if dados['tipo'] == 'sopa':
+            valores.append(f"Codigo Sopa: {self._sanitizar_texto_zpl(dados['codigo_sopa'])}")
+        valores.append(f"Validade: {self._sanitizar_texto_zpl(dados['validade'])}")
+        valores.append(f"Data: {data_impressao}")
         
-        return texto_sanitizado
+        return template, valores
     
-    def _gerar_zpl_normal(self, dados):
-        """Gera ZPL para etiquetas normais"""
-        config = self.settings_manager.get_layout_config()
-        
-        zpl = "^XA\n"
-        zpl += "^MMT\n"
-        zpl += "^PW472\n"
-        zpl += "^LL1181\n"
-        zpl += "^LS0\n"
+    def _obter_template(self, tipo, n_linhas):
+        """Retorna template do cache, recompilando só quando o layout muda"""
+        versao = self.settings_manager.layout_version
+        if versao != self._versao_templates:
+            self._templates.clear()
+            self._versao_templates = versao
+        
+        chave = (tipo, n_linhas)
+        template = self._templates.get(chave)
+        if template is None:
+            template = self._compilar_template(tipo, n_linhas, self.settings_manager.get_layout_config())
+            self._templates[chave] = template
+        return template
+    
+    def _compilar_template(self, tipo, n_linhas, config):
+        """Compila o layout em trechos fixos e campos variáveis"""
+        trechos = [f"^XA\n^MMT\n^PR{config['velocidade_impressao']}\n^PW472\n^LL1181\n^LS0\n"]
+        campos = []
         
         pos_y = config['margem_y'] * 8
         pos_x = config['margem_x'] * 8
@@ -90,124 +245,54 @@ class ZPLGenerator:
         if config['centralizar']:
             pos_x = 236  # Centro da etiqueta
         
-        # Código
-        codigo_sanitizado = self._sanitizar_texto_zpl(dados['codigo'])
-        zpl += f"^CF0,{config['fonte_titulo'] * 3}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_titulo'] * 3},{config['fonte_titulo'] * 3}^FH\\^FDCodigo: {codigo_sanitizado}^FS\n"
-        
-        pos_y += config['espacamento'] * 3
-        
-        # Descrição
-        zpl += f"^CF0,{config['fonte_subtitulo'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_subtitulo'] * 2},{config['fonte_subtitulo'] * 2}^FH\\^FDDescricao:^FS\n"
-        
-        pos_y += config['espacamento'] * 2
-        
-        # Quebrar descrição em linhas
-        descricao_sanitizada = self._sanitizar_texto_zpl(dados['descricao'])
-        linhas_descricao = self._quebrar_texto(descricao_sanitizada, 30)
-        for linha in linhas_descricao:
-            zpl += f"^CF0,{config['fonte_texto'] * 2}\n"
-            zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_texto'] * 2},{config['fonte_texto'] * 2}^FH\\^FD{linha}^FS\n"
-            pos_y += config['espacamento'] * 1.5
-        
-        pos_y += config['espacamento']
-        
-        # Validade
-        validade_sanitizada = self._sanitizar_texto_zpl(dados['validade'])
-        zpl += f"^CF0,{config['fonte_subtitulo'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_subtitulo'] * 2},{config['fonte_subtitulo'] * 2}^FH\\^FDValidade: {validade_sanitizada}^FS\n"
-        
-        pos_y += config['espacamento'] * 2
-        
-        # Data de impressão
-        data_impressao = datetime.now().strftime('%d/%m/%Y %H:%M')
-        zpl += f"^CF0,{config['fonte_texto'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_texto'] * 2},{config['fonte_texto'] * 2}^FH\\^FDData: {data_impressao}^FS\n"
-        
-        zpl += "^XZ"
-        return zpl
-    
-    def _gerar_zpl_sopa(self, dados):
-        """Gera ZPL para etiquetas de sopa"""
-        config = self.settings_manager.get_layout_config()
-        
-        zpl = "^XA\n"
-        zpl += "^MMT\n"
-        zpl += "^PW472\n"
-        zpl += "^LL1181\n"
-        zpl += "^LS0\n"
-        
-        pos_y = config['margem_y'] * 8
-        pos_x = config['margem_x'] * 8
-        align = "C" if config['centralizar'] else "N"
+        fonte_titulo = config['fonte_titulo'] * 3
+        fonte_subtitulo = config['fonte_subtitulo'] * 2
+        fonte_texto = config['fonte_texto'] * 2
         
-        if config['centralizar']:
-            pos_x = 236  # Centro da etiqueta
+        def adicionar(fonte, y, campo=None, texto=None):
+            trechos[-1] += f"^CF0,{fonte}\n^FO{pos_x},{y}^A0{align},{fonte},{fonte}^FH\\"
+            if campo is None:
+                trechos[-1] += f"^FD{texto}^FS\n"
+            else:
+                campos.append(campo)
+                trechos.append("^FS\n")
         
         # Código
-        codigo_sanitizado = self._sanitizar_texto_zpl(dados['codigo'])
-        zpl += f"^CF0,{config['fonte_titulo'] * 3}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_titulo'] * 3},{config['fonte_titulo'] * 3}^FH\\^FDCodigo: {codigo_sanitizado}^FS\n"
-        
+        adicionar(fonte_titulo, pos_y, campo='codigo')
         pos_y += config['espacamento'] * 3
         
         # Descrição
-        zpl += f"^CF0,{config['fonte_subtitulo'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_subtitulo'] * 2},{config['fonte_subtitulo'] * 2}^FH\\^FDDescricao:^FS\n"
-        
+        adicionar(fonte_subtitulo, pos_y, texto="Descricao:")
         pos_y += config['espacamento'] * 2
         
-        # Quebrar descrição em linhas
-        descricao_sanitizada = self._sanitizar_texto_zpl(dados['descricao'])
-        linhas_descricao = self._quebrar_texto(descricao_sanitizada, 30)
-        for linha in linhas_descricao:
-            zpl += f"^CF0,{config['fonte_texto'] * 2}\n"
-            zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_texto'] * 2},{config['fonte_texto'] * 2}^FH\\^FD{linha}^FS\n"
+        for i in range(n_linhas):
+            adicionar(fonte_texto, pos_y, campo=f'descricao_{i}')
             pos_y += config['espacamento'] * 1.5
         
         pos_y += config['espacamento']
         
-        # Código da sopa (caldeira+turno+lote)
-        codigo_sopa_sanitizado = self._sanitizar_texto_zpl(dados['codigo_sopa'])
-        zpl += f"^CF0,{config['fonte_subtitulo'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_subtitulo'] * 2},{config['fonte_subtitulo'] * 2}^FH\\^FDCodigo Sopa: {codigo_sopa_sanitizado}^FS\n"
-        
-        pos_y += config['espacamento'] * 2
+        if tipo == 'sopa':
+            # Código da sopa (caldeira+turno+lote)
+            adicionar(fonte_subtitulo, pos_y, campo='codigo_sopa')
+            pos_y += config['espacamento'] * 2
         
         # Validade
-        validade_sanitizada = self._sanitizar_texto_zpl(dados['validade'])
-        zpl += f"^CF0,{config['fonte_subtitulo'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_subtitulo'] * 2},{config['fonte_subtitulo'] * 2}^FH\\^FDValidade: {validade_sanitizada}^FS\n"
-        
+        adicionar(fonte_subtitulo, pos_y, campo='validade')
         pos_y += config['espacamento'] * 2
         
-        # Informações de conservação (com quebra manual melhorada)
-        conservacao_sanitizada = self._sanitizar_texto_zpl(dados['conservacao'])
-        
-        # Quebrar manualmente o texto de conservação em pontos específicos
-        linhas_conservacao_custom = [
-            "Conservacao: -10 a -18 graus",
-            "ou mais frio.",
-            "Validade apos descongelamento:",
-            "5 dias"
-        ]
-        
-        for linha in linhas_conservacao_custom:
-            if linha.strip():
-                zpl += f"^CF0,{config['fonte_texto'] * 2}\n"
-                zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_texto'] * 2},{config['fonte_texto'] * 2}^FH\\^FD{linha.strip()}^FS\n"
+        if tipo == 'sopa':
+            # Informações de conservação (com quebra manual melhorada)
+            for linha in self.LINHAS_CONSERVACAO:
+                adicionar(fonte_texto, pos_y, texto=linha)
                 pos_y += config['espacamento'] * 1.2
-        
-        pos_y += config['espacamento']
+            
+            pos_y += config['espacamento']
         
         # Data de impressão
-        data_impressao = datetime.now().strftime('%d/%m/%Y %H:%M')
-        zpl += f"^CF0,{config['fonte_texto'] * 2}\n"
-        zpl += f"^FO{pos_x},{pos_y}^A0{align},{config['fonte_texto'] * 2},{config['fonte_texto'] * 2}^FH\\^FDData: {data_impressao}^FS\n"
+        adicionar(fonte_texto, pos_y, campo='data')
         
-        zpl += "^XZ"
-        return zpl
+        trechos[-1] += "^XZ"
+        return TemplateZPL(trechos, campos)
     
     def _quebrar_texto(self, texto, max_chars):
         """Quebra texto em linhas"""
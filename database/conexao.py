@@ -0,0 +1,235 @@
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# Quanto o SQLite espera sozinho por um lock antes de devolver SQLITE_BUSY (ms)
+BUSY_TIMEOUT_MS = 3000
+# Novas tentativas quando o banco continua ocupado depois do busy timeout
+TENTATIVAS = 4
+ESPERA_INICIAL = 0.05
+
+PRAGMAS = (
+    ('cache_size', -16000),         # 16 MB de cache de páginas
+    ('mmap_size', 64 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+# A conexão de escrita grava o journal de impressão, que precisa sobreviver a
+# uma queda de energia: com FULL o commit só volta depois do fsync. As
+# somente-leitura não gravam nada e ficam com NORMAL.
+SYNCHRONOUS_ESCRITA = 'FULL'
+SYNCHRONOUS_LEITURA = 'NORMAL'
+
+# GetDriveTypeW: unidade mapeada de um compartilhamento de rede
+DRIVE_REMOTE = 4
+
+
+def caminho_de_rede(db_path):
+    """Banco num compartilhamento de rede (UNC ou unidade mapeada), onde o WAL não funciona"""
+    if str(db_path).replace('/', '\\').startswith('\\\\'):
+        return True
+    if os.name != 'nt':
+        return False
+
+    import ctypes
+    unidade = os.path.splitdrive(os.path.abspath(db_path))[0] + '\\'
+    return ctypes.windll.kernel32.GetDriveTypeW(unidade) == DRIVE_REMOTE
+
+
+def conectar(db_path, check_same_thread=True, somente_leitura=False, usar_wal=True):
+    """Abre conexão com WAL, pragmas de desempenho e busy timeout
+
+    `usar_wal=False` mantém o journal padrão (rollback), para bancos em
+    compartilhamentos que a detecção de rede não reconhece.
+    """
+    if somente_leitura:
+        uri = 'file:' + pathname2url(os.path.abspath(db_path)) + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+
+    # O WAL usa memória compartilhada entre os processos da mesma máquina;
+    # em compartilhamento de rede fica o journal padrão (rollback)
+    if not somente_leitura:
+        if usar_wal and not caminho_de_rede(db_path):
+            modo = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+            if modo.lower() != 'wal':
+                print(f"⚠️ WAL indisponível, usando journal '{modo}'")
+        else:
+            # O modo WAL fica gravado no arquivo: desfaz o de uma abertura anterior
+            try:
+                conn.execute('PRAGMA journal_mode = DELETE')
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ Não foi possível sair do WAL (banco em uso por outra estação?): {e}")
+
+    synchronous = SYNCHRONOUS_LEITURA if somente_leitura else SYNCHRONOUS_ESCRITA
+    conn.execute(f'PRAGMA synchronous = {synchronous}')
+    for nome, valor in PRAGMAS:
+        conn.execute(f'PRAGMA {nome} = {valor}')
+    return conn
+
+
+def banco_ocupado(erro):
+    """Erro de lock (SQLITE_BUSY/SQLITE_LOCKED) que vale tentar de novo"""
+    mensagem = str(erro).lower()
+    return isinstance(erro, sqlite3.OperationalError) and ('locked' in mensagem or 'busy' in mensagem)
+
+
+def com_retentativa(conn, funcao, *args, **kwargs):
+    """Executa `funcao` (uma transação completa) repetindo se o banco estiver ocupado
+
+    Qualquer exceção desfaz a transação (a conexão de escrita é
+    compartilhada: uma transação aberta travaria as outras threads e
+    estações). Se o banco estiver ocupado, tenta de novo com a espera
+    dobrando (e uma variação aleatória para as estações não baterem juntas).
+    """
+    for tentativa in range(TENTATIVAS):
+        try:
+            return funcao(*args, **kwargs)
+        except BaseException as e:
+            conn.rollback()
+            if not banco_ocupado(e) or tentativa == TENTATIVAS - 1:
+                raise
+            espera = ESPERA_INICIAL * (2 ** tentativa) * random.uniform(1.0, 1.5)
+            print(f"⏳ Banco ocupado, tentando de novo em {espera:.2f}s")
+            time.sleep(espera)
+
+
+def somente_leitura(erro):
+    """Erro de escrita numa conexão somente-leitura (SQLITE_READONLY)"""
+    return isinstance(erro, sqlite3.OperationalError) and 'readonly' in str(erro).lower()
+
+
+def metodo_de_escrita(metodo):
+    """Decorador para métodos de escrita de classes com `self.pool` (PoolConexoes)
+
+    O método roda com a conexão de escrita (uma transação por vez), é
+    desfeito se levantar qualquer exceção e repetido se o banco estiver
+    ocupado.
+    """
+    @functools.wraps(metodo)
+    def executar(self, *args, **kwargs):
+        with self.pool.escrita() as conn:
+            return com_retentativa(conn, metodo, self, *args, **kwargs)
+    return executar
+
+
+class PoolConexoes:
+    """Conexões SQLite por thread: uma de escrita compartilhada e uma de leitura por thread
+
+    Escritas de qualquer thread passam pela mesma conexão, uma transação de
+    cada vez (em fila, na ordem de chegada ao lock). Cada thread que lê
+    ganha a sua conexão somente-leitura; com WAL as leituras não esperam
+    as escritas nem umas às outras. Dentro de `escrita()` a thread lê pela
+    conexão de escrita, para enxergar o que ainda não foi commitado.
+    """
+
+    def __init__(self, db_path, usar_wal=True):
+        self.db_path = db_path
+        self._escritor = conectar(db_path, check_same_thread=False, usar_wal=usar_wal)
+        self._lock_escrita = threading.RLock()
+        self._local = threading.local()
+        self._leitores = []
+        self._lock_leitores = threading.Lock()
+
+    @contextmanager
+    def escrita(self):
+        """Reserva a conexão de escrita para a thread atual (reentrante)"""
+        with self._lock_escrita:
+            self._local.escrevendo = getattr(self._local, 'escrevendo', 0) + 1
+            try:
+                yield self._escritor
+            finally:
+                self._local.escrevendo -= 1
+
+    def escrevendo(self):
+        """A thread atual está dentro de `escrita()`?"""
+        return bool(getattr(self._local, 'escrevendo', 0))
+
+    def conexao(self):
+        """Conexão da thread atual: a de escrita dentro de `escrita()`, senão a de leitura"""
+        if self.escrevendo():
+            return self._escritor
+
+        leitor = getattr(self._local, 'leitor', None)
+        if leitor is None:
+            # check_same_thread=False só para o fechar() poder fechá-la de outra thread
+            leitor = conectar(self.db_path, check_same_thread=False, somente_leitura=True)
+            self._local.leitor = leitor
+            with self._lock_leitores:
+                self._leitores.append(leitor)
+        return leitor
+
+    def fechar(self):
+        """Fecha a conexão de escrita e todas as de leitura"""
+        with self._lock_leitores:
+            leitores, self._leitores = self._leitores, []
+        for leitor in leitores:
+            leitor.close()
+        with self._lock_escrita:
+            self._escritor.close()
+
+
+class CursorSobDemanda:
+    """Cursor que começa na conexão de leitura e passa para a de escrita na primeira escrita
+
+    Para código que usa get_cursor()/commit() fora de um método de escrita:
+    o comando que a conexão somente-leitura recusa é repetido na conexão de
+    escrita, com `abrir_escrita()` (que reserva a escrita para a thread até
+    o commit). As leituras seguintes do cursor também vão pela de escrita.
+    Se a escrita que abriria a transação falhar, ela é desfeita e
+    `liberar()` devolve a conexão de escrita na hora, em vez de esperar um
+    commit que não virá.
+    """
+
+    def __init__(self, cursor, abrir_escrita, liberar):
+        self._cursor = cursor
+        self._abrir_escrita = abrir_escrita
+        self._liberar = liberar
+
+    def execute(self, sql, parametros=()):
+        return self._executar('execute', sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self._executar('executemany', sql, parametros)
+
+    def executescript(self, script):
+        # Scripts costumam escrever e não podem ser repetidos pela metade
+        conn = self._abrir_escrita()
+        self._cursor = conn.cursor()
+        self._na_escrita(conn, 'executescript', script)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def _executar(self, metodo, sql, parametros):
+        try:
+            getattr(self._cursor, metodo)(sql, parametros)
+        except sqlite3.OperationalError as e:
+            if not somente_leitura(e):
+                raise
+            conn = self._abrir_escrita()
+            self._cursor = conn.cursor()
+            self._na_escrita(conn, metodo, sql, parametros)
+        return self
+
+    def _na_escrita(self, conn, metodo, *args):
+        transacao_aberta = conn.in_transaction
+        try:
+            getattr(self._cursor, metodo)(*args)
+        except Exception:
+            if not transacao_aberta:
+                conn.rollback()
+                self._liberar()
+            raise
@@ -1,17 +1,35 @@
 import sqlite3
 import os
+import threading
+
+from core.classificacao import ClassificadorSopa, REGRAS_PADRAO
+from database.conexao import PoolConexoes, CursorSobDemanda, banco_ocupado, com_retentativa, metodo_de_escrita
 
 class DatabaseManager:
-    def __init__(self, db_path="etiquetas.db"):
+    def __init__(self, db_path="etiquetas.db", usar_wal=True):
         self.db_path = db_path
-        self.conn = None
+        self.usar_wal = usar_wal
+        
+        # Uma conexão de escrita compartilhada + uma de leitura por thread
+        self.pool = None
+        
+        # Escrita reservada por get_cursor() fora dos métodos de escrita, até o commit()
+        self._escrita_aberta = threading.local()
+        
+        # Funções chamadas quando a tabela de materiais muda: ouvinte(evento, dados)
+        self._ouvintes = []
+        
+        # Regras de sopa compiladas (refeito só quando regras_sopa muda)
+        self._classificador = None
+        
         self.init_database()
     
     def init_database(self):
         """Inicializa o banco de dados"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.create_tables()
+            self.pool = PoolConexoes(self.db_path, self.usar_wal)
+            with self.pool.escrita():
+                self.create_tables()
             print(f"✅ Banco de dados conectado: {self.db_path}")
         except Exception as e:
             print(f"❌ Erro ao conectar banco: {e}")
@@ -30,6 +48,8 @@ class DatabaseManager:
                 dias_validade INTEGER NOT NULL,
                 categoria TEXT NOT NULL,
                 sopa_especial TEXT DEFAULT 'N' CHECK(sopa_especial IN ('S', 'N')),
+                tipo TEXT,
+                validade_efetiva INTEGER,
                 data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
@@ -42,6 +62,34 @@ class DatabaseManager:
             cursor.execute('ALTER TABLE materiais ADD COLUMN sopa_especial TEXT DEFAULT "N"')
             print("✅ Coluna 'sopa_especial' adicionada à tabela materiais")
         
+        # Classificação gravada (tipo e validade efetiva), calculada ao inserir
+        if 'tipo' not in colunas:
+            cursor.execute('ALTER TABLE materiais ADD COLUMN tipo TEXT')
+            cursor.execute('ALTER TABLE materiais ADD COLUMN validade_efetiva INTEGER')
+            print("✅ Colunas de classificação adicionadas à tabela materiais")
+        
+        # Regras de detecção de sopa, editáveis em tempo de execução
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'regras_sopa'")
+        regras_existiam = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS regras_sopa (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo_regra TEXT NOT NULL CHECK(tipo_regra IN ('categoria', 'palavra')),
+                padrao TEXT NOT NULL,
+                validade_dias INTEGER
+            )
+        ''')
+        
+        # Padrões só num banco novo: se o usuário apagar todas as regras, continua sem
+        if not regras_existiam:
+            cursor.executemany(
+                'INSERT INTO regras_sopa (tipo_regra, padrao, validade_dias) VALUES (?, ?, ?)',
+                REGRAS_PADRAO
+            )
+            print("✅ Regras de sopa padrão cadastradas")
+        
+        self._criar_busca_textual(cursor)
+        
         # Tabela de impressões (log)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS impressoes (
@@ -53,30 +101,285 @@ class DatabaseManager:
             )
         ''')
         
+        # Journal de trabalhos de impressão (gravado antes do envio, retomado após queda)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trabalhos_impressao (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                estado TEXT NOT NULL CHECK(estado IN ('enfileirado', 'enviando', 'enviado', 'confirmado', 'falhou')),
+                estacao TEXT,
+                impressora TEXT,
+                material TEXT,
+                tipo TEXT,
+                prioridade TEXT DEFAULT 'normal',
+                quantidade INTEGER NOT NULL,
+                zpl TEXT NOT NULL,
+                blocos TEXT NOT NULL,
+                formatos TEXT,
+                enviadas TEXT,
+                erro TEXT,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_trabalhos_estacao ON trabalhos_impressao (estacao, estado)'
+        )
+        
         self.conn.commit()
+        
+        # Materiais ainda sem classificação (banco antigo ou outra estação)
+        self.reclassificar_materiais()
+        
         print("✅ Tabelas criadas/verificadas com sucesso")
     
+    def _criar_busca_textual(self, cursor):
+        """Índice FTS5 sobre descrição e categoria, mantido por triggers"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'materiais_fts'")
+        existia = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS materiais_fts USING fts5(
+                    descricao, categoria,
+                    content='materiais', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            # SQLite compilado sem FTS5: busca cai para LIKE
+            self.busca_textual = False
+            print(f"⚠️ Busca textual (FTS5) indisponível: {e}")
+            return
+        self.busca_textual = True
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS materiais_fts_ai AFTER INSERT ON materiais BEGIN
+                INSERT INTO materiais_fts (rowid, descricao, categoria)
+                VALUES (new.id, new.descricao, new.categoria);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS materiais_fts_ad AFTER DELETE ON materiais BEGIN
+                INSERT INTO materiais_fts (materiais_fts, rowid, descricao, categoria)
+                VALUES ('delete', old.id, old.descricao, old.categoria);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS materiais_fts_au AFTER UPDATE OF descricao, categoria ON materiais BEGIN
+                INSERT INTO materiais_fts (materiais_fts, rowid, descricao, categoria)
+                VALUES ('delete', old.id, old.descricao, old.categoria);
+                INSERT INTO materiais_fts (rowid, descricao, categoria)
+                VALUES (new.id, new.descricao, new.categoria);
+            END
+        ''')
+        
+        if not existia:
+            # Banco que já tinha materiais antes do índice
+            cursor.execute("INSERT INTO materiais_fts (materiais_fts) VALUES ('rebuild')")
+            print("✅ Índice de busca textual criado")
+    
+    @property
+    def conn(self):
+        """Conexão da thread atual (a de escrita dentro de pool.escrita(), senão a de leitura)"""
+        return self.pool.conexao()
+    
     def get_cursor(self):
-        """Retorna cursor do banco"""
-        return self.conn.cursor()
+        """Retorna cursor do banco
+        
+        Fora dos métodos de escrita o cursor lê pela conexão de leitura da
+        thread; na primeira escrita passa para a conexão de escrita, que fica
+        reservada para a thread até o commit() (como uma transação aberta).
+        """
+        if self.pool.escrevendo():
+            return self.conn.cursor()
+        return CursorSobDemanda(self.conn.cursor(), self._abrir_escrita, self._liberar_escrita)
     
     def commit(self):
-        """Commit das transações"""
-        self.conn.commit()
+        """Commit das transações (libera a escrita reservada por get_cursor())"""
+        try:
+            self.conn.commit()
+        finally:
+            self._liberar_escrita()
+    
+    def _abrir_escrita(self):
+        """Reserva a conexão de escrita para a thread até o próximo commit()"""
+        if getattr(self._escrita_aberta, 'contexto', None) is None:
+            reserva = self.pool.escrita()
+            reserva.__enter__()
+            self._escrita_aberta.contexto = reserva
+        return self.pool.conexao()
+    
+    def _liberar_escrita(self):
+        reserva = getattr(self._escrita_aberta, 'contexto', None)
+        if reserva is not None:
+            self._escrita_aberta.contexto = None
+            reserva.__exit__(None, None, None)
     
     def close(self):
-        """Fecha a conexão"""
-        if self.conn:
-            self.conn.close()
+        """Fecha as conexões"""
+        if self.pool:
+            self.pool.fechar()
     
+    def adicionar_ouvinte(self, ouvinte):
+        """Registra função chamada a cada mudança em materiais
+        
+        Eventos: ('inserido', dict do material), ('deletado', id) e
+        ('recarregar', None) após importações em lote.
+        """
+        self._ouvintes.append(ouvinte)
+    
+    def _notificar(self, evento, dados=None):
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(evento, dados)
+            except Exception as e:
+                print(f"⚠️ Erro ao notificar mudança em materiais: {e}")
+    
+    def classificador(self):
+        """Regras de sopa compiladas num único matcher (em cache até as regras mudarem)"""
+        if self._classificador is None:
+            cursor = self.get_cursor()
+            cursor.execute('SELECT tipo_regra, padrao, validade_dias FROM regras_sopa ORDER BY id')
+            self._classificador = ClassificadorSopa(cursor.fetchall())
+        return self._classificador
+    
+    def listar_regras_sopa(self):
+        """Lista as regras de detecção de sopa"""
+        cursor = self.get_cursor()
+        cursor.execute('SELECT id, tipo_regra, padrao, validade_dias FROM regras_sopa ORDER BY id')
+        return cursor.fetchall()
+    
+    def inserir_regra_sopa(self, tipo_regra, padrao, validade_dias=None):
+        """Insere regra de sopa ('categoria' ou 'palavra') e reclassifica os materiais"""
+        cursor = self._escrever('''
+            INSERT INTO regras_sopa (tipo_regra, padrao, validade_dias)
+            VALUES (?, ?, ?)
+        ''', (tipo_regra, padrao.strip(), validade_dias))
+        self._regras_alteradas()
+        return cursor.lastrowid
+    
+    def deletar_regra_sopa(self, regra_id):
+        """Remove regra de sopa e reclassifica os materiais"""
+        self._escrever('DELETE FROM regras_sopa WHERE id = ?', (regra_id,))
+        self._regras_alteradas()
+    
+    @metodo_de_escrita
+    def _escrever(self, sql, parametros=()):
+        """Executa uma escrita e faz commit (repetindo se o banco estiver ocupado)"""
+        cursor = self.get_cursor()
+        cursor.execute(sql, parametros)
+        self.commit()
+        return cursor
+    
+    def _regras_alteradas(self):
+        self._classificador = None
+        self.reclassificar_materiais(todos=True)
+    
+    @metodo_de_escrita
     def inserir_material(self, material, descricao, dias_validade, categoria, sopa_especial='N'):
-        """Insere novo material"""
+        """Insere novo material (já classificado: tipo e validade efetiva)"""
+        tipo, validade_efetiva = self.classificador().classificar(descricao, dias_validade, categoria, sopa_especial)
         cursor = self.get_cursor()
         cursor.execute('''
-            INSERT INTO materiais (material, descricao, dias_validade, categoria, sopa_especial)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (material, descricao, dias_validade, categoria, sopa_especial))
+            INSERT INTO materiais (material, descricao, dias_validade, categoria, sopa_especial,
+                                   tipo, validade_efetiva)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (material, descricao, dias_validade, categoria, sopa_especial, tipo, validade_efetiva))
         self.commit()
+        self._notificar('inserido', {
+            'id': cursor.lastrowid,
+            'material': material,
+            'descricao': descricao,
+            'dias_validade': dias_validade,
+            'categoria': categoria,
+            'sopa_especial': sopa_especial,
+            'tipo': tipo,
+            'validade_efetiva': validade_efetiva
+        })
+    
+    # Linhas por transação na importação: libera o lock de escrita entre os lotes
+    # para outras estações (ex: journal de impressão) não esperarem a importação toda
+    LINHAS_POR_COMMIT = 2000
+    
+    def importar_materiais(self, linhas):
+        """Insere vários materiais em transações de LINHAS_POR_COMMIT linhas
+        
+        `linhas` são tuplas (material, descricao, dias_validade, categoria, sopa_especial).
+        Linhas inválidas ou repetidas são puladas. Retorna (importados, erros).
+        
+        Se um lote falhar, os anteriores já estão gravados: a exceção sai com
+        o atributo `importados` (quantos ficaram no banco).
+        """
+        linhas = list(linhas)
+        importados = 0
+        erros = 0
+        
+        classificador = self.classificador()
+        try:
+            for inicio in range(0, len(linhas), self.LINHAS_POR_COMMIT):
+                lote = linhas[inicio:inicio + self.LINHAS_POR_COMMIT]
+                with self.pool.escrita() as conn:
+                    ok, falhas = com_retentativa(conn, self._importar_lote, lote, classificador)
+                importados += ok
+                erros += falhas
+        except Exception as e:
+            e.importados = importados
+            raise
+        finally:
+            # O catálogo precisa ver os lotes já commitados, mesmo com falha no meio
+            if importados:
+                self._notificar('recarregar')
+        return importados, erros
+    
+    def _importar_lote(self, lote, classificador):
+        cursor = self.get_cursor()
+        importados = 0
+        erros = 0
+        for material, descricao, dias_validade, categoria, sopa_especial in lote:
+            tipo, validade_efetiva = classificador.classificar(descricao, dias_validade, categoria, sopa_especial)
+            try:
+                cursor.execute('''
+                    INSERT INTO materiais (material, descricao, dias_validade, categoria, sopa_especial,
+                                           tipo, validade_efetiva)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (material, descricao, dias_validade, categoria, sopa_especial, tipo, validade_efetiva))
+                importados += 1
+            except sqlite3.Error as e:
+                if banco_ocupado(e):
+                    raise
+                erros += 1
+        
+        self.commit()
+        return importados, erros
+    
+    @metodo_de_escrita
+    def reclassificar_materiais(self, todos=False):
+        """Grava tipo e validade efetiva dos materiais (só os sem classificação, ou todos)
+        
+        Retorna quantos materiais tiveram a classificação alterada.
+        """
+        cursor = self.get_cursor()
+        filtro = '' if todos else 'WHERE tipo IS NULL OR validade_efetiva IS NULL'
+        cursor.execute(f'''
+            SELECT id, descricao, dias_validade, categoria, sopa_especial, tipo, validade_efetiva
+            FROM materiais {filtro}
+        ''')
+        
+        classificador = self.classificador()
+        alteracoes = []
+        for id_material, descricao, dias_validade, categoria, sopa_especial, tipo, validade in cursor.fetchall():
+            classificacao = classificador.classificar(descricao, dias_validade, categoria, sopa_especial)
+            if classificacao != (tipo, validade):
+                alteracoes.append(classificacao + (id_material,))
+        
+        if alteracoes:
+            cursor.executemany(
+                'UPDATE materiais SET tipo = ?, validade_efetiva = ? WHERE id = ?', alteracoes
+            )
+            self.commit()
+            print(f"🏷️ {len(alteracoes)} material(is) classificado(s)")
+            self._notificar('recarregar')
+        return len(alteracoes)
     
     def listar_materiais(self):
         """Lista todos os materiais"""
@@ -87,12 +390,46 @@ class DatabaseManager:
         ''')
         return cursor.fetchall()
     
+    def buscar_materiais(self, texto, limite=50):
+        """Busca materiais pela descrição/categoria, mais relevantes primeiro
+        
+        Cada palavra do texto vale como prefixo e todas precisam aparecer.
+        Retorna as mesmas colunas de listar_materiais.
+        """
+        palavras = texto.split()
+        if not palavras:
+            return []
+        
+        cursor = self.get_cursor()
+        if not self.busca_textual:
+            condicoes = ' AND '.join(["(descricao || ' ' || categoria) LIKE ?"] * len(palavras))
+            cursor.execute(f'''
+                SELECT id, material, descricao, dias_validade, categoria, sopa_especial
+                FROM materiais WHERE {condicoes} ORDER BY material LIMIT ?
+            ''', [f'%{palavra}%' for palavra in palavras] + [limite])
+            return cursor.fetchall()
+        
+        # Cada palavra entre aspas (sem operadores do FTS5) e como prefixo
+        consulta = ' '.join('"{}"*'.format(palavra.replace('"', '""')) for palavra in palavras)
+        cursor.execute('''
+            SELECT m.id, m.material, m.descricao, m.dias_validade, m.categoria, m.sopa_especial
+            FROM materiais_fts
+            JOIN materiais m ON m.id = materiais_fts.rowid
+            WHERE materiais_fts MATCH ?
+            ORDER BY materiais_fts.rank
+            LIMIT ?
+        ''', (consulta, limite))
+        return cursor.fetchall()
+    
+    @metodo_de_escrita
     def deletar_material(self, material_id):
         """Deleta material por ID"""
         cursor = self.get_cursor()
         cursor.execute('DELETE FROM materiais WHERE id = ?', (material_id,))
         self.commit()
+        self._notificar('deletado', material_id)
     
+    @metodo_de_escrita
     def log_impressao(self, material, tipo, dados_extras=None):
         """Registra impressão no log"""
         cursor = self.get_cursor()
@@ -0,0 +1,293 @@
+import itertools
+import json
+import queue
+import socket
+import sqlite3
+import threading
+import time
+
+from core.zpl_generator import ZPLGenerator
+from database.conexao import com_retentativa, banco_ocupado
+
+
+class JournalAtrasado(Exception):
+    """A gravação no journal não terminou a tempo: a remessa não pode sair sem registro"""
+
+
+class JournalImpressao:
+    """Journal dos trabalhos de impressão no SQLite (write-ahead)
+
+    Todo trabalho é gravado como 'enfileirado' antes de ir para a impressora,
+    passa a 'enviando' (gravado em disco antes do primeiro byte sair) e
+    depois a 'enviado' (entregue ao spooler/impressora), 'confirmado' (a
+    impressora de rede terminou de imprimir) ou 'falhou'. Ao reabrir o
+    programa, os que ficaram 'enfileirado' nesta estação são retomados; os
+    que ficaram 'enviando' podem já ter saído, então o operador decide
+    (`interrompidos`). Trabalhos enviados em remessas guardam as faixas de
+    etiquetas já entregues (`enviadas`), e a retomada reimprime só o resto.
+
+    O banco pode ser compartilhado entre estações: o id vem do SQLite e cada
+    registro guarda a estação que o criou, que é a única a retomá-lo.
+
+    As mudanças de estado são gravadas por uma thread própria, várias numa
+    mesma transação (group commit), para acompanhar lotes grandes sem um
+    commit por etiqueta. Usa o pool de conexões do DatabaseManager: grava
+    pela conexão de escrita e lê pela conexão de leitura da thread.
+    """
+
+    ENFILEIRADO = 'enfileirado'
+    ENVIANDO = 'enviando'
+    ENVIADO = 'enviado'
+    CONFIRMADO = 'confirmado'
+    FALHOU = 'falhou'
+
+    # Máximo de mudanças de estado gravadas numa mesma transação
+    MAX_POR_COMMIT = 500
+    # Trabalhos finalizados mais antigos que isto são apagados ao abrir
+    DIAS_RETENCAO = 30
+    # Trabalho enviado há mais tempo que isto para de esperar a confirmação do ~HS
+    ESPERA_CONFIRMACAO = 3600
+
+    def __init__(self, pool, estacao=None):
+        self.pool = pool
+        self.estacao = estacao or socket.gethostname()
+
+        self._operacoes = queue.Queue()
+        self._sequencia = itertools.count(1)
+        self._ultima_sequencia = 0
+        self._gravado = 0
+        self._condicao = threading.Condition()
+
+        # Trabalhos enviados aguardando a impressora ficar ociosa: id -> (impressoras, enviado_em)
+        self._aguardando_confirmacao = {}
+        self._lock = threading.Lock()
+
+        self._enviando = set()   # journal_ids já marcados como 'enviando'
+
+        self._limpar_antigos()
+
+        self._thread = threading.Thread(target=self._executar, name="JournalImpressao", daemon=True)
+        self._thread.start()
+
+    def registrar(self, trabalho):
+        """Grava o trabalho como 'enfileirado' e define trabalho.journal_id
+
+        O INSERT é feito na hora (não pela thread de gravação) porque o id
+        vem do SQLite: com o banco compartilhado, só ele garante ids únicos
+        entre as estações.
+        """
+        formatos = {nome: list(formato) for nome, formato in (trabalho.formatos or {}).items()}
+        parametros = (
+            self.ENFILEIRADO, self.estacao, trabalho.impressora, trabalho.descricao,
+            trabalho.tipo, trabalho.prioridade, trabalho.quantidade, trabalho.zpl,
+            json.dumps(trabalho.blocos), json.dumps(formatos) if trabalho.formatos is not None else None
+        )
+        with self.pool.escrita() as conn:
+            trabalho.journal_id = com_retentativa(conn, self._inserir, conn, parametros)
+        return trabalho.journal_id
+
+    def marcar_enviando(self, journal_ids):
+        """Trabalhos prestes a ir para a impressora; espera a gravação antes de retornar
+
+        Se o programa cair depois disto, não dá para saber se as etiquetas
+        saíram: na volta o operador decide (`interrompidos`). Se a gravação
+        não terminar dentro do timeout, levanta JournalAtrasado e as
+        etiquetas não devem ser enviadas.
+        """
+        with self._lock:
+            novos = [journal_id for journal_id in journal_ids if journal_id not in self._enviando]
+            self._enviando.update(novos)
+        for journal_id in novos:
+            self._gravar('''
+                UPDATE trabalhos_impressao SET estado = ?, atualizado_em = CURRENT_TIMESTAMP
+                WHERE id = ? AND estado = ?
+            ''', (self.ENVIANDO, journal_id, self.ENFILEIRADO))
+        # Também grava as remessas anteriores (marcar_remessa) antes da próxima sair
+        if not self.sincronizar():
+            raise JournalAtrasado("Journal de impressão não foi gravado a tempo; etiquetas não enviadas")
+
+    def marcar_remessa(self, journal_id, inicio, fim):
+        """Etiquetas [inicio, fim) do trabalho (na ordem de `blocos`) entregues à impressora"""
+        self._gravar('''
+            UPDATE trabalhos_impressao
+            SET enviadas = json_insert(COALESCE(enviadas, '[]'), '$[#]', json_array(?, ?)),
+                atualizado_em = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (inicio, fim, journal_id))
+
+    def reiniciar(self, journal_id, blocos):
+        """Volta um trabalho interrompido para 'enfileirado' só com as etiquetas que faltam"""
+        with self._lock:
+            self._enviando.discard(journal_id)
+        self._gravar('''
+            UPDATE trabalhos_impressao
+            SET estado = ?, blocos = ?, quantidade = ?, zpl = ?, enviadas = NULL, atualizado_em = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (
+            self.ENFILEIRADO, json.dumps(blocos), sum(quantidade for _, quantidade in blocos),
+            ZPLGenerator.montar_stream(blocos), journal_id
+        ))
+        self.sincronizar()
+
+    def marcar_enviado(self, journal_id, impressoras, confirmaveis=()):
+        """Trabalho entregue às impressoras; também entra no log de impressões
+
+        `confirmaveis` são as impressoras cujo status (~HS) vai confirmar que
+        terminaram de imprimir; sem nenhuma, o trabalho fica como 'enviado'.
+        """
+        with self._lock:
+            self._enviando.discard(journal_id)
+        self._gravar('''
+            UPDATE trabalhos_impressao SET estado = ?, atualizado_em = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (self.ENVIADO, journal_id))
+        self._gravar('''
+            INSERT INTO impressoes (material, tipo, dados_extras)
+            SELECT material, COALESCE(tipo, ''),
+                   json_object('trabalho', id, 'quantidade', quantidade, 'impressoras', json(?))
+            FROM trabalhos_impressao WHERE id = ?
+        ''', (json.dumps(sorted(impressoras)), journal_id))
+
+        confirmaveis = set(confirmaveis) & set(impressoras)
+        if confirmaveis:
+            with self._lock:
+                self._aguardando_confirmacao[journal_id] = (confirmaveis, time.time())
+
+    def marcar_falha(self, journal_id, erro):
+        with self._lock:
+            self._enviando.discard(journal_id)
+        self._gravar('''
+            UPDATE trabalhos_impressao SET estado = ?, erro = ?, atualizado_em = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (self.FALHOU, str(erro), journal_id))
+
+    def status_impressora(self, impressora, status):
+        """Recebe o status (~HS) do monitor; impressora ociosa confirma o que foi enviado antes"""
+        if not status['ok'] or status['etiquetas_restantes'] or status['formatos_no_buffer']:
+            return
+
+        confirmados = []
+        limite = time.time() - self.ESPERA_CONFIRMACAO
+        with self._lock:
+            for journal_id, (impressoras, enviado_em) in list(self._aguardando_confirmacao.items()):
+                if enviado_em < limite:
+                    # Impressora que sumiu do monitor: fica só como 'enviado'
+                    del self._aguardando_confirmacao[journal_id]
+                elif impressora in impressoras and enviado_em < status['timestamp']:
+                    impressoras.discard(impressora)
+                    if not impressoras:
+                        del self._aguardando_confirmacao[journal_id]
+                        confirmados.append(journal_id)
+
+        for journal_id in confirmados:
+            self._gravar('''
+                UPDATE trabalhos_impressao SET estado = ?, atualizado_em = CURRENT_TIMESTAMP WHERE id = ?
+            ''', (self.CONFIRMADO, journal_id))
+
+    def pendentes(self):
+        """Trabalhos desta estação que ficaram 'enfileirado' (não chegaram à impressora), do mais antigo ao mais novo"""
+        return self._listar(self.ENFILEIRADO)
+
+    def interrompidos(self):
+        """Trabalhos desta estação que ficaram 'enviando': podem ter sido impressos, no todo ou em parte"""
+        return self._listar(self.ENVIANDO)
+
+    def _listar(self, estado):
+        self.sincronizar()
+        cursor = self.pool.conexao().execute('''
+            SELECT id, impressora, material, tipo, prioridade, blocos, formatos, enviadas
+            FROM trabalhos_impressao WHERE estacao = ? AND estado = ? ORDER BY id
+        ''', (self.estacao, estado))
+        linhas = cursor.fetchall()
+
+        trabalhos = []
+        for journal_id, impressora, material, tipo, prioridade, blocos, formatos, enviadas in linhas:
+            trabalhos.append({
+                'journal_id': journal_id,
+                'impressora': impressora,
+                'descricao': material,
+                'tipo': tipo,
+                'prioridade': prioridade or 'normal',
+                'blocos': [tuple(bloco) for bloco in json.loads(blocos)],
+                'formatos': (
+                    {nome: tuple(formato) for nome, formato in json.loads(formatos).items()}
+                    if formatos is not None else None
+                ),
+                'enviadas': [tuple(faixa) for faixa in json.loads(enviadas or '[]')],
+            })
+        return trabalhos
+
+    def sincronizar(self, timeout=5.0):
+        """Espera tudo o que já foi pedido estar gravado em disco"""
+        with self._condicao:
+            alvo = self._ultima_sequencia
+            return self._condicao.wait_for(lambda: self._gravado >= alvo, timeout)
+
+    def fechar(self, timeout=5.0):
+        """Grava o que falta e para a thread de gravação (o pool é fechado pelo DatabaseManager)"""
+        self._operacoes.put(None)
+        self._thread.join(timeout)
+
+    def _gravar(self, sql, parametros):
+        with self._condicao:
+            sequencia = next(self._sequencia)
+            self._ultima_sequencia = sequencia
+            self._operacoes.put((sequencia, sql, parametros))
+
+    def _limpar_antigos(self):
+        with self.pool.escrita() as conn:
+            conn.execute('''
+                DELETE FROM trabalhos_impressao
+                WHERE estado != ? AND atualizado_em < datetime('now', ?)
+            ''', (self.ENFILEIRADO, f'-{self.DIAS_RETENCAO} days'))
+            conn.commit()
+
+    def _inserir(self, conn, parametros):
+        cursor = conn.execute('''
+            INSERT INTO trabalhos_impressao
+                (estado, estacao, impressora, material, tipo, prioridade, quantidade, zpl, blocos, formatos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', parametros)
+        conn.commit()
+        return cursor.lastrowid
+
+    def _gravar_grupo(self, conn, grupo):
+        for _, sql, parametros in grupo:
+            conn.execute(sql, parametros)
+        conn.commit()
+
+    def _executar(self):
+        encerrando = False
+        while not encerrando:
+            operacao = self._operacoes.get()
+            if operacao is None:
+                break
+
+            # Junta na mesma transação tudo o que chegou enquanto o último commit rodava
+            grupo = [operacao]
+            while len(grupo) < self.MAX_POR_COMMIT:
+                try:
+                    operacao = self._operacoes.get_nowait()
+                except queue.Empty:
+                    break
+                if operacao is None:
+                    encerrando = True
+                    break
+                grupo.append(operacao)
+
+            with self.pool.escrita() as conn:
+                try:
+                    com_retentativa(conn, self._gravar_grupo, conn, grupo)
+                except sqlite3.Error as e:
+                    # Um registro ruim não pode derrubar o grupo todo: grava um a um
+                    conn.rollback()
+                    if banco_ocupado(e):
+                        print(f"⚠️ Banco ocupado ao gravar journal, gravando um a um: {e}")
+                    for operacao in grupo:
+                        try:
+                            com_retentativa(conn, self._gravar_grupo, conn, [operacao])
+                        except sqlite3.Error as e:
+                            conn.rollback()
+                            print(f"❌ Erro ao gravar journal de impressão: {e}")
+
+            with self._condicao:
+                self._gravado = grupo[-1][0]
+                self._condicao.notify_all()
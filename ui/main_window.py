@@ -11,6 +11,10 @@ from .tabs.configuracoes_tab import ConfiguracoesTab
 from .tabs.sobre_tab import SobreTab
 from database.db_manager import DatabaseManager
 from utils.settings_manager import SettingsManager
+from core.transporte_rede import fechar_pools
+from core.registro_impressoras import RegistroImpressoras
+from core.monitor_impressoras import MonitorImpressoras
+from core.printer_manager import PrinterManager
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -19,8 +23,17 @@ class MainWindow(QMainWindow):
         self.setGeometry(100, 100, 1400, 900)
         
         # Managers
-        self.db_manager = DatabaseManager()
         self.settings_manager = SettingsManager()
+        self.db_manager = DatabaseManager(usar_wal=self.settings_manager.usar_wal())
+        
+        # Impressoras: registro único (descoberta em segundo plano) e gerenciador compartilhado
+        self.registro_impressoras = RegistroImpressoras()
+        self.monitor_impressoras = MonitorImpressoras(self.settings_manager)
+        self.printer_manager = PrinterManager(
+            self.settings_manager, self.registro_impressoras, self.monitor_impressoras
+        )
+        self.registro_impressoras.iniciar()
+        self.monitor_impressoras.iniciar()
         
         # Configurar estilo
         self.setStyleSheet(self.get_app_style())
@@ -70,9 +83,9 @@ class MainWindow(QMainWindow):
         """)
         
         # Criar abas
-        self.impressao_tab = ImpressaoTab(self.db_manager, self.settings_manager)
+        self.impressao_tab = ImpressaoTab(self.db_manager, self.settings_manager, self.printer_manager)
         self.cadastro_tab = CadastroTab(self.db_manager)
-        self.configuracoes_tab = ConfiguracoesTab(self.settings_manager)
+        self.configuracoes_tab = ConfiguracoesTab(self.settings_manager, self.printer_manager, self.db_manager)
         self.sobre_tab = SobreTab()
         
         # Adicionar abas
@@ -143,5 +156,9 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Fecha a aplicação"""
+        self.impressao_tab.encerrar()
+        self.registro_impressoras.parar()
+        self.monitor_impressoras.parar()
+        fechar_pools()
         self.db_manager.close()
         event.accept()
\ No newline at end of file
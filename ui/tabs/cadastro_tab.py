@@ -137,8 +137,20 @@ class CadastroTab(QWidget):
         btn_deletar = ModernButton("🗑️ Deletar", "danger")
         btn_deletar.clicked.connect(self.deletar_material)
         
+        # Busca por descrição/categoria (índice textual no banco)
+        self.busca_input = QLineEdit()
+        self.busca_input.setPlaceholderText("🔍 Buscar descrição ou categoria...")
+        self.busca_input.setClearButtonEnabled(True)
+        
+        self.busca_timer = QTimer(self)
+        self.busca_timer.setSingleShot(True)
+        self.busca_timer.setInterval(250)
+        self.busca_timer.timeout.connect(self.atualizar_tabela)
+        self.busca_input.textChanged.connect(self.busca_timer.start)
+        
         header_layout.addWidget(title)
         header_layout.addStretch()
+        header_layout.addWidget(self.busca_input)
         header_layout.addWidget(btn_atualizar)
         header_layout.addWidget(btn_deletar)
         
@@ -206,7 +218,11 @@ class CadastroTab(QWidget):
     def atualizar_tabela(self):
         """Atualiza a tabela de materiais"""
         try:
-            dados = self.db_manager.listar_materiais()
+            texto = self.busca_input.text().strip()
+            if texto:
+                dados = self.db_manager.buscar_materiais(texto, limite=500)
+            else:
+                dados = self.db_manager.listar_materiais()
             
             self.tabela_materiais.setRowCount(len(dados))
             
@@ -269,7 +285,7 @@ class CadastroTab(QWidget):
                 )
                 return
             
-            importados = 0
+            linhas = []
             erros = 0
             
             for _, row in df.iterrows():
@@ -280,17 +296,20 @@ class CadastroTab(QWidget):
                         if sopa_especial not in ['S', 'N']:
                             sopa_especial = 'N'
                     
-                    self.db_manager.inserir_material(
+                    linhas.append((
                         str(row['material']), 
                         str(row['descricao']), 
                         int(row['dias_validade']), 
                         str(row['categoria']),
                         sopa_especial
-                    )
-                    importados += 1
+                    ))
                 except:
                     erros += 1
             
+            # Gravado em lotes de LINHAS_POR_COMMIT linhas, uma transação por lote
+            importados, erros_banco = self.db_manager.importar_materiais(linhas)
+            erros += erros_banco
+            
             QMessageBox.information(
                 self, "Importação Concluída", 
                 f"Importados: {importados}\nErros: {erros}"
@@ -299,7 +318,17 @@ class CadastroTab(QWidget):
             self.atualizar_tabela()
             
         except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao importar planilha: {str(e)}")
+            # Lotes gravados antes da falha continuam no banco
+            importados = getattr(e, 'importados', 0)
+            if importados:
+                self.atualizar_tabela()
+                QMessageBox.critical(
+                    self, "Erro",
+                    f"Erro ao importar planilha: {str(e)}\n\n"
+                    f"{importados} material(is) já tinham sido importados e foram mantidos."
+                )
+            else:
+                QMessageBox.critical(self, "Erro", f"Erro ao importar planilha: {str(e)}")
     
     def exportar_planilha(self):
         """Exporta dados para planilha"""
@@ -4,17 +4,24 @@ from PyQt5.QtGui import *
 
 from ..components.modern_widgets import ModernButton, ModernGroupBox
 from ..components.etiqueta_preview import EtiquetaPreview
-from core.printer_manager import PrinterManager
 
 class ConfiguracoesTab(QWidget):
     configuracoes_alteradas = pyqtSignal()
     
-    def __init__(self, settings_manager):
+    def __init__(self, settings_manager, printer_manager, db_manager):
         super().__init__()
         self.settings_manager = settings_manager
-        self.printer_manager = PrinterManager(settings_manager)
+        self.printer_manager = printer_manager
+        self.db_manager = db_manager
         self.setup_ui()
         self.carregar_configuracoes()
+        
+        # Lista de impressoras chega/atualiza em segundo plano
+        self.printer_manager.registro.impressoras_alteradas.connect(self.atualizar_lista_impressoras)
+        
+        # Estado das impressoras de rede ao vivo
+        if self.printer_manager.monitor:
+            self.printer_manager.monitor.status_atualizado.connect(self.on_status_impressora)
     
     def setup_ui(self):
         """Configura a interface"""
@@ -45,17 +52,79 @@ class ConfiguracoesTab(QWidget):
         form_impressora = QFormLayout(grupo_impressora)
         
         self.impressora_combo = QComboBox()
-        self.impressora_combo.addItems(self.printer_manager.impressoras_disponiveis)
+        self.impressora_combo.addItems(self._impressoras_para_combo(self.printer_manager.impressoras_disponiveis))
         
         # IMPORTANTE: Conectar ao método correto
         self.impressora_combo.currentTextChanged.connect(self.on_impressora_changed)
-        form_impressora.addRow("Impressora:", self.impressora_combo)
+        
+        btn_atualizar_lista = ModernButton("🔄", "secondary")
+        btn_atualizar_lista.setToolTip("Procurar impressoras novamente")
+        btn_atualizar_lista.setFixedWidth(40)
+        btn_atualizar_lista.clicked.connect(self.printer_manager.registro.atualizar_agora)
+        
+        impressora_layout = QHBoxLayout()
+        impressora_layout.addWidget(self.impressora_combo)
+        impressora_layout.addWidget(btn_atualizar_lista)
+        form_impressora.addRow("Impressora:", impressora_layout)
+        
+        # Transporte por impressora: spooler do sistema ou raw TCP direto
+        self.transporte_combo = QComboBox()
+        self.transporte_combo.addItem("Spooler do sistema", "spooler")
+        self.transporte_combo.addItem("Rede - raw TCP (porta 9100)", "tcp")
+        self.transporte_combo.addItem("lp via stdin (raw, sem arquivo temporário)", "lp")
+        self.transporte_combo.addItem("Dispositivo direto (ex: /dev/usb/lp0)", "dispositivo")
+        self.transporte_combo.currentIndexChanged.connect(self.on_transporte_changed)
+        form_impressora.addRow("Transporte:", self.transporte_combo)
+        
+        self.endereco_input = QLineEdit()
+        self.endereco_input.setPlaceholderText("IP:porta (rede) ou caminho do dispositivo")
+        self.endereco_input.editingFinished.connect(self.salvar_transporte)
+        form_impressora.addRow("Endereço:", self.endereco_input)
         
         # Status da impressora
         self.status_impressora = QLabel("Status: Não configurado")
         self.status_impressora.setStyleSheet("color: #e74c3c; font-weight: bold;")
         form_impressora.addRow("Status:", self.status_impressora)
         
+        # Estado físico da impressora (~HS), atualizado ao vivo pelo monitor
+        self.saude_impressora = QLabel("—")
+        self.saude_impressora.setWordWrap(True)
+        self.saude_impressora.setStyleSheet("color: #7f8c8d; font-weight: bold;")
+        form_impressora.addRow("Estado:", self.saude_impressora)
+        
+        # Formatos armazenados: layout gravado na impressora, só os campos trafegam
+        self.formatos_armazenados_checkbox = QCheckBox("Armazenar layout na impressora (^DF/^XF)")
+        self.formatos_armazenados_checkbox.setToolTip(
+            "Envia o layout uma única vez e depois só os dados variáveis de cada etiqueta"
+        )
+        self.formatos_armazenados_checkbox.stateChanged.connect(self.on_formatos_armazenados_changed)
+        form_impressora.addRow(self.formatos_armazenados_checkbox)
+        
+        # Janela de agrupamento: trabalhos próximos viram um único job
+        self.janela_agrupamento_spin = QSpinBox()
+        self.janela_agrupamento_spin.setRange(0, 1000)
+        self.janela_agrupamento_spin.setSingleStep(50)
+        self.janela_agrupamento_spin.setSuffix(" ms")
+        self.janela_agrupamento_spin.valueChanged.connect(self.on_janela_agrupamento_changed)
+        form_impressora.addRow("Agrupar trabalhos:", self.janela_agrupamento_spin)
+        
+        # Velocidade (^PR) e dosagem do envio: só N etiquetas à frente da impressão
+        self.velocidade_spin = QSpinBox()
+        self.velocidade_spin.setRange(2, 14)
+        self.velocidade_spin.setSuffix(" pol/s")
+        self.velocidade_spin.valueChanged.connect(self.on_velocidade_changed)
+        form_impressora.addRow("Velocidade:", self.velocidade_spin)
+        
+        self.etiquetas_a_frente_spin = QSpinBox()
+        self.etiquetas_a_frente_spin.setRange(0, 500)
+        self.etiquetas_a_frente_spin.setSpecialValueText("Sem limite")
+        self.etiquetas_a_frente_spin.setSuffix(" etiquetas")
+        self.etiquetas_a_frente_spin.setToolTip(
+            "Quantas etiquetas enviar além das que a impressora já deve ter impresso"
+        )
+        self.etiquetas_a_frente_spin.valueChanged.connect(self.on_etiquetas_a_frente_changed)
+        form_impressora.addRow("Enviar à frente:", self.etiquetas_a_frente_spin)
+        
         btn_layout = QHBoxLayout()
         
         btn_testar = ModernButton("🧪 Testar Impressora", "warning")
@@ -75,6 +144,12 @@ class ConfiguracoesTab(QWidget):
         
         layout.addWidget(grupo_impressora)
         
+        # Grupo pools: várias impressoras atendendo o mesmo destino
+        self.create_pool_config(layout)
+        
+        # Grupo regras de sopa: o que faz um material ser tratado como sopa
+        self.create_regras_sopa_config(layout)
+        
         # Grupo layout
         grupo_layout = ModernGroupBox("🎨 Layout da Etiqueta")
         form_layout = QFormLayout(grupo_layout)
@@ -161,9 +236,280 @@ class ConfiguracoesTab(QWidget):
         
         parent.addWidget(widget)
     
+    def _impressoras_para_combo(self, impressoras):
+        """Lista do combo: impressoras descobertas + a salva (mesmo se ainda não apareceu) + pools"""
+        impressoras = list(impressoras)
+        impressora_salva = self.settings_manager.get_printer_name()
+        if impressora_salva and impressora_salva not in impressoras:
+            impressoras.insert(0, impressora_salva)
+        for nome_pool in self.settings_manager.get_pools():
+            if nome_pool not in impressoras:
+                impressoras.append(nome_pool)
+        return impressoras
+    
+    def create_pool_config(self, layout):
+        """Cria configuração de pools de impressoras"""
+        grupo_pool = ModernGroupBox("🔗 Pools de Impressoras")
+        form_pool = QFormLayout(grupo_pool)
+        
+        self.pool_combo = QComboBox()
+        self.pool_combo.setEditable(True)
+        self.pool_combo.lineEdit().setPlaceholderText("Nome do pool (ex: Linha 1)")
+        self.pool_combo.addItems(list(self.settings_manager.get_pools()))
+        self.pool_combo.setCurrentIndex(-1)
+        self.pool_combo.currentTextChanged.connect(self.carregar_pool)
+        form_pool.addRow("Pool:", self.pool_combo)
+        
+        self.pool_estrategia_combo = QComboBox()
+        self.pool_estrategia_combo.addItem("Rodízio (round-robin)", "rodizio")
+        self.pool_estrategia_combo.addItem("Menor fila", "menos_fila")
+        form_pool.addRow("Distribuição:", self.pool_estrategia_combo)
+        
+        self.pool_membros_list = QListWidget()
+        self.pool_membros_list.setMaximumHeight(120)
+        form_pool.addRow("Impressoras:", self.pool_membros_list)
+        self.atualizar_membros_pool(self.printer_manager.impressoras_disponiveis)
+        
+        btn_layout = QHBoxLayout()
+        
+        btn_salvar_pool = ModernButton("💾 Salvar Pool", "success")
+        btn_salvar_pool.clicked.connect(self.salvar_pool)
+        
+        btn_remover_pool = ModernButton("🗑️ Remover Pool", "danger")
+        btn_remover_pool.clicked.connect(self.remover_pool)
+        
+        btn_layout.addWidget(btn_salvar_pool)
+        btn_layout.addWidget(btn_remover_pool)
+        form_pool.addRow(btn_layout)
+        
+        info_label = QLabel("ℹ️ Selecione o pool como impressora para distribuir as etiquetas entre os membros")
+        info_label.setWordWrap(True)
+        info_label.setStyleSheet("color: #7f8c8d; font-size: 11px; font-style: italic;")
+        form_pool.addRow(info_label)
+        
+        layout.addWidget(grupo_pool)
+    
+    def create_regras_sopa_config(self, layout):
+        """Cria configuração das regras de detecção de sopa"""
+        grupo_regras = ModernGroupBox("🍲 Regras de Sopa")
+        form_regras = QFormLayout(grupo_regras)
+        
+        self.regras_table = QTableWidget()
+        self.regras_table.setColumnCount(3)
+        self.regras_table.setHorizontalHeaderLabels(["Tipo", "Padrão", "Validade"])
+        self.regras_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.regras_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.regras_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.regras_table.setMaximumHeight(160)
+        form_regras.addRow(self.regras_table)
+        
+        self.regra_tipo_combo = QComboBox()
+        self.regra_tipo_combo.addItem("Palavra na descrição", "palavra")
+        self.regra_tipo_combo.addItem("Categoria", "categoria")
+        form_regras.addRow("Tipo:", self.regra_tipo_combo)
+        
+        self.regra_padrao_input = QLineEdit()
+        self.regra_padrao_input.setPlaceholderText("Texto procurado (ex: caldo)")
+        form_regras.addRow("Padrão:", self.regra_padrao_input)
+        
+        self.regra_validade_spin = QSpinBox()
+        self.regra_validade_spin.setRange(0, 3650)
+        self.regra_validade_spin.setSpecialValueText("Regra de sopa padrão")
+        self.regra_validade_spin.setSuffix(" dias")
+        self.regra_validade_spin.setToolTip("Validade fixa para os materiais desta regra (0 = regra de sopa padrão)")
+        form_regras.addRow("Validade:", self.regra_validade_spin)
+        
+        btn_layout = QHBoxLayout()
+        
+        btn_adicionar_regra = ModernButton("➕ Adicionar Regra", "success")
+        btn_adicionar_regra.clicked.connect(self.adicionar_regra_sopa)
+        
+        btn_remover_regra = ModernButton("🗑️ Remover Regra", "danger")
+        btn_remover_regra.clicked.connect(self.remover_regra_sopa)
+        
+        btn_layout.addWidget(btn_adicionar_regra)
+        btn_layout.addWidget(btn_remover_regra)
+        form_regras.addRow(btn_layout)
+        
+        info_label = QLabel("ℹ️ Vale a primeira regra da lista que casar. Ao mudar as regras, todos os materiais são reclassificados")
+        info_label.setWordWrap(True)
+        info_label.setStyleSheet("color: #7f8c8d; font-size: 11px; font-style: italic;")
+        form_regras.addRow(info_label)
+        
+        layout.addWidget(grupo_regras)
+        self.carregar_regras_sopa()
+    
+    def carregar_regras_sopa(self):
+        """Mostra as regras de sopa do banco"""
+        regras = self.db_manager.listar_regras_sopa()
+        self.regras_table.setRowCount(len(regras))
+        for linha, (regra_id, tipo_regra, padrao, validade_dias) in enumerate(regras):
+            item_tipo = QTableWidgetItem("Categoria" if tipo_regra == 'categoria' else "Palavra")
+            item_tipo.setData(Qt.UserRole, regra_id)
+            self.regras_table.setItem(linha, 0, item_tipo)
+            self.regras_table.setItem(linha, 1, QTableWidgetItem(padrao))
+            self.regras_table.setItem(
+                linha, 2, QTableWidgetItem(f"{validade_dias} dias" if validade_dias is not None else "Padrão")
+            )
+    
+    def adicionar_regra_sopa(self):
+        """Cadastra a regra de sopa preenchida"""
+        padrao = self.regra_padrao_input.text().strip()
+        if not padrao:
+            QMessageBox.warning(self, "Aviso", "Informe o padrão da regra!")
+            return
+        
+        validade_dias = self.regra_validade_spin.value() or None
+        try:
+            self.db_manager.inserir_regra_sopa(self.regra_tipo_combo.currentData(), padrao, validade_dias)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao salvar regra: {str(e)}")
+            return
+        
+        self.regra_padrao_input.clear()
+        self.regra_validade_spin.setValue(0)
+        self.carregar_regras_sopa()
+    
+    def remover_regra_sopa(self):
+        """Remove a regra de sopa selecionada"""
+        linha = self.regras_table.currentRow()
+        if linha < 0:
+            QMessageBox.warning(self, "Aviso", "Selecione uma regra!")
+            return
+        
+        padrao = self.regras_table.item(linha, 1).text()
+        resposta = QMessageBox.question(
+            self, "Confirmar", f"Remover a regra '{padrao}'? Os materiais serão reclassificados."
+        )
+        if resposta != QMessageBox.Yes:
+            return
+        
+        try:
+            self.db_manager.deletar_regra_sopa(self.regras_table.item(linha, 0).data(Qt.UserRole))
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao remover regra: {str(e)}")
+            return
+        self.carregar_regras_sopa()
+    
+    def atualizar_membros_pool(self, impressoras):
+        """Lista impressoras que podem fazer parte do pool (mantendo as marcadas)"""
+        marcadas = set(self._membros_marcados())
+        pool = self.settings_manager.get_pool(self.pool_combo.currentText().strip())
+        if pool:
+            marcadas.update(pool['impressoras'])
+        
+        self.pool_membros_list.clear()
+        for nome in sorted(set(impressoras) | marcadas):
+            if nome == "Nenhuma impressora encontrada" or self.settings_manager.get_pool(nome):
+                continue
+            item = QListWidgetItem(nome)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if nome in marcadas else Qt.Unchecked)
+            self.pool_membros_list.addItem(item)
+    
+    def _membros_marcados(self):
+        membros = []
+        for i in range(self.pool_membros_list.count()):
+            item = self.pool_membros_list.item(i)
+            if item.checkState() == Qt.Checked:
+                membros.append(item.text())
+        return membros
+    
+    def carregar_pool(self, nome_pool):
+        """Mostra membros e estratégia do pool selecionado"""
+        pool = self.settings_manager.get_pool(nome_pool.strip())
+        if not pool:
+            return
+        
+        index = self.pool_estrategia_combo.findData(pool.get('estrategia', 'rodizio'))
+        self.pool_estrategia_combo.setCurrentIndex(max(index, 0))
+        for i in range(self.pool_membros_list.count()):
+            item = self.pool_membros_list.item(i)
+            item.setCheckState(Qt.Checked if item.text() in pool['impressoras'] else Qt.Unchecked)
+    
+    def salvar_pool(self):
+        """Salva o pool com as impressoras marcadas"""
+        nome_pool = self.pool_combo.currentText().strip()
+        membros = self._membros_marcados()
+        
+        if not nome_pool:
+            QMessageBox.warning(self, "Aviso", "Informe o nome do pool!")
+            return
+        if nome_pool in self.printer_manager.impressoras_disponiveis:
+            QMessageBox.warning(self, "Aviso", "O nome do pool não pode ser igual ao de uma impressora!")
+            return
+        if len(membros) < 2:
+            QMessageBox.warning(self, "Aviso", "Marque pelo menos duas impressoras para o pool!")
+            return
+        
+        self.settings_manager.save_pool(nome_pool, membros, self.pool_estrategia_combo.currentData())
+        if self.pool_combo.findText(nome_pool) < 0:
+            self.pool_combo.addItem(nome_pool)
+        self.atualizar_lista_impressoras(self.printer_manager.impressoras_disponiveis)
+        QMessageBox.information(self, "Sucesso", f"Pool '{nome_pool}' salvo com {len(membros)} impressoras!")
+    
+    def remover_pool(self):
+        """Remove o pool selecionado"""
+        nome_pool = self.pool_combo.currentText().strip()
+        if not self.settings_manager.get_pool(nome_pool):
+            QMessageBox.warning(self, "Aviso", "Selecione um pool existente!")
+            return
+        
+        self.settings_manager.remove_pool(nome_pool)
+        self.pool_combo.removeItem(self.pool_combo.findText(nome_pool))
+        self.atualizar_lista_impressoras(self.printer_manager.impressoras_disponiveis)
+    
+    def atualizar_lista_impressoras(self, impressoras):
+        """Atualiza o combo quando impressoras aparecem ou somem"""
+        atual = self.impressora_combo.currentText()
+        
+        self.impressora_combo.blockSignals(True)
+        self.impressora_combo.clear()
+        self.impressora_combo.addItems(self._impressoras_para_combo(impressoras))
+        index = self.impressora_combo.findText(atual)
+        if index >= 0:
+            self.impressora_combo.setCurrentIndex(index)
+        self.impressora_combo.blockSignals(False)
+        
+        if self.impressora_combo.currentText() != atual:
+            if atual:
+                # A impressora selecionada sumiu
+                self.on_impressora_changed(self.impressora_combo.currentText())
+            else:
+                self.carregar_transporte(self.impressora_combo.currentText())
+        
+        self.atualizar_membros_pool(impressoras)
+        print(f"🔄 Lista de impressoras atualizada: {impressoras}")
+    
+    def on_status_impressora(self, impressora_nome, status):
+        """Mostra o estado (~HS) da impressora selecionada"""
+        if impressora_nome != self.impressora_combo.currentText():
+            return
+        self.mostrar_saude_impressora(status)
+    
+    def mostrar_saude_impressora(self, status):
+        """Atualiza o rótulo de estado físico da impressora"""
+        if status is None:
+            self.saude_impressora.setText("— (disponível só para impressoras de rede)")
+            self.saude_impressora.setStyleSheet("color: #7f8c8d; font-weight: bold;")
+            return
+        
+        hora = QDateTime.fromSecsSinceEpoch(int(status['timestamp'])).toString("HH:mm:ss")
+        if status['ok']:
+            texto = f"🟢 Pronta — {status['etiquetas_restantes']} etiqueta(s) no lote ({hora})"
+            cor = "#27ae60"
+        else:
+            texto = f"🔴 {', '.join(status['problemas'])} ({hora})"
+            cor = "#e74c3c"
+        self.saude_impressora.setText(texto)
+        self.saude_impressora.setStyleSheet(f"color: {cor}; font-weight: bold;")
+    
     def on_impressora_changed(self, impressora_nome):
         """Quando a impressora muda no combo"""
         print(f"🔄 Impressora selecionada: '{impressora_nome}'")
+        self.carregar_transporte(impressora_nome)
+        if self.printer_manager.monitor:
+            self.mostrar_saude_impressora(self.printer_manager.monitor.status(impressora_nome))
         
         if impressora_nome and impressora_nome != "Nenhuma impressora encontrada":
             # Salvar automaticamente
@@ -181,6 +527,102 @@ class ConfiguracoesTab(QWidget):
             self.status_impressora.setText("Status: Não configurado")
             self.status_impressora.setStyleSheet("color: #e74c3c; font-weight: bold;")
     
+    def carregar_transporte(self, impressora_nome):
+        """Mostra o transporte configurado para a impressora"""
+        if self.settings_manager.get_pool(impressora_nome):
+            # Pool: cada membro usa o próprio transporte
+            self.transporte_combo.setEnabled(False)
+            self.endereco_input.setEnabled(False)
+            return
+        self.transporte_combo.setEnabled(True)
+        
+        transporte = self.settings_manager.get_transporte_impressora(impressora_nome)
+        
+        self.transporte_combo.blockSignals(True)
+        index = self.transporte_combo.findData(transporte['tipo'])
+        self.transporte_combo.setCurrentIndex(max(index, 0))
+        self.transporte_combo.blockSignals(False)
+        
+        if transporte['tipo'] == 'tcp':
+            self.endereco_input.setText(f"{transporte['host']}:{transporte.get('porta', 9100)}")
+        elif transporte['tipo'] == 'dispositivo':
+            self.endereco_input.setText(transporte['caminho'])
+        else:
+            self.endereco_input.clear()
+        self.endereco_input.setEnabled(transporte['tipo'] in ('tcp', 'dispositivo'))
+    
+    def on_transporte_changed(self):
+        """Quando o tipo de transporte muda"""
+        tipo = self.transporte_combo.currentData()
+        
+        # O endereço do tipo anterior não serve para o novo: volta ao salvo para este tipo, se houver
+        salvo = self.settings_manager.get_transporte_impressora(self.impressora_combo.currentText())
+        if salvo['tipo'] == tipo == 'tcp':
+            self.endereco_input.setText(f"{salvo['host']}:{salvo.get('porta', 9100)}")
+        elif salvo['tipo'] == tipo == 'dispositivo':
+            self.endereco_input.setText(salvo['caminho'])
+        else:
+            self.endereco_input.clear()
+        
+        if tipo == 'tcp':
+            self.endereco_input.setPlaceholderText("IP:porta (ex: 192.168.0.50:9100)")
+        elif tipo == 'dispositivo':
+            self.endereco_input.setPlaceholderText("Caminho do dispositivo (ex: /dev/usb/lp0)")
+        self.endereco_input.setEnabled(tipo in ('tcp', 'dispositivo'))
+        
+        # Rede/dispositivo só são salvos quando o endereço for preenchido (editingFinished)
+        self.salvar_transporte()
+    
+    def salvar_transporte(self):
+        """Salva o transporte da impressora selecionada"""
+        impressora_nome = self.impressora_combo.currentText()
+        if not impressora_nome or impressora_nome == "Nenhuma impressora encontrada":
+            return
+        
+        tipo = self.transporte_combo.currentData()
+        transporte = {'tipo': tipo}
+        
+        if tipo == 'tcp':
+            endereco = self.endereco_input.text().strip()
+            if not endereco:
+                return  # Aguardar o endereço ser preenchido
+            host, _, porta = endereco.partition(':')
+            if not host or any(c in host for c in '/\\ '):
+                QMessageBox.warning(self, "Aviso", f"Endereço de rede inválido: '{endereco}'")
+                return
+            if porta and not porta.isdigit():
+                QMessageBox.warning(self, "Aviso", f"Porta inválida: '{porta}'")
+                return
+            transporte['host'] = host
+            transporte['porta'] = int(porta) if porta else 9100
+        elif tipo == 'dispositivo':
+            caminho = self.endereco_input.text().strip()
+            if not caminho:
+                return  # Aguardar o caminho ser preenchido
+            transporte['caminho'] = caminho
+        
+        print(f"🔌 Transporte de '{impressora_nome}': {transporte}")
+        self.settings_manager.save_transporte_impressora(impressora_nome, transporte)
+        self.printer_manager.seletor_transporte.resetar(impressora_nome)
+    
+    def on_formatos_armazenados_changed(self):
+        """Ativa/desativa o uso de formatos armazenados"""
+        self.settings_manager.save_settings({
+            'formatos_armazenados': self.formatos_armazenados_checkbox.isChecked()
+        })
+    
+    def on_janela_agrupamento_changed(self, valor):
+        """Altera a janela de agrupamento da fila de impressão"""
+        self.settings_manager.save_settings({'janela_agrupamento_ms': valor})
+    
+    def on_velocidade_changed(self, valor):
+        """Altera a velocidade de impressão (^PR), usada no layout e na dosagem do envio"""
+        self.settings_manager.save_settings({'velocidade_impressao': valor})
+    
+    def on_etiquetas_a_frente_changed(self, valor):
+        """Altera quantas etiquetas podem ficar à frente da impressão"""
+        self.settings_manager.save_settings({'etiquetas_a_frente': valor})
+    
     def salvar_impressora_manual(self):
         """Salva impressora manualmente"""
         impressora_nome = self.impressora_combo.currentText()
@@ -212,6 +654,9 @@ class ConfiguracoesTab(QWidget):
 📋 Combo Selecionado: '{self.impressora_combo.currentText()}'
 📊 Impressoras Disponíveis: {len(self.printer_manager.impressoras_disponiveis)}
 
+📡 Métodos de envio:
+{self.printer_manager.seletor_transporte.diagnostico()}
+
 ⚙️ Verifique o console para logs detalhados.
 """
         QMessageBox.information(self, "Debug - Configurações", debug_msg)
@@ -247,6 +692,22 @@ class ConfiguracoesTab(QWidget):
         self.margem_x_slider.setValue(config['margem_x'])
         self.margem_y_slider.setValue(config['margem_y'])
         
+        self.formatos_armazenados_checkbox.blockSignals(True)
+        self.formatos_armazenados_checkbox.setChecked(self.settings_manager.usar_formatos_armazenados())
+        self.formatos_armazenados_checkbox.blockSignals(False)
+        
+        self.janela_agrupamento_spin.blockSignals(True)
+        self.janela_agrupamento_spin.setValue(int(self.settings_manager.get_janela_agrupamento() * 1000))
+        self.janela_agrupamento_spin.blockSignals(False)
+        
+        self.velocidade_spin.blockSignals(True)
+        self.velocidade_spin.setValue(self.settings_manager.get_velocidade_impressao())
+        self.velocidade_spin.blockSignals(False)
+        
+        self.etiquetas_a_frente_spin.blockSignals(True)
+        self.etiquetas_a_frente_spin.setValue(self.settings_manager.get_etiquetas_a_frente())
+        self.etiquetas_a_frente_spin.blockSignals(False)
+        
         # Carregar impressora
         impressora_salva = self.settings_manager.get_printer_name()
         print(f"🔍 Carregando impressora salva: '{impressora_salva}'")
@@ -258,6 +719,7 @@ class ConfiguracoesTab(QWidget):
                 self.status_impressora.setText(f"Status: Configurado - {impressora_salva}")
                 self.status_impressora.setStyleSheet("color: #27ae60; font-weight: bold;")
                 print(f"✅ Impressora carregada no combo: '{impressora_salva}'")
+                self.carregar_transporte(impressora_salva)
             else:
                 print(f"⚠️ Impressora '{impressora_salva}' não encontrada na lista")
                 self.status_impressora.setText("Status: Impressora não encontrada")
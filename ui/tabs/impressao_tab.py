@@ -2,26 +2,50 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from datetime import datetime, timedelta
+import time
 
 from ..components.modern_widgets import ModernButton, ModernGroupBox
 from ..components.etiqueta_preview import EtiquetaPreview
 from core.material_detector import MaterialDetector
+from core.autocompletar import CompletadorMateriais
+from core.estacao import MetricasEstacao
 from core.zpl_generator import ZPLGenerator
-from core.printer_manager import PrinterManager
+from core.fila_impressao import FilaImpressao, TrabalhoImpressao, PRIORIDADES, NOMES_PRIORIDADE, etiquetas_restantes
+from database.journal_impressao import JournalImpressao
 
 class ImpressaoTab(QWidget):
-    def __init__(self, db_manager, settings_manager):
+    def __init__(self, db_manager, settings_manager, printer_manager):
         super().__init__()
         self.db_manager = db_manager
         self.settings_manager = settings_manager
         
         # Componentes principais
         self.material_detector = MaterialDetector(db_manager)
+        self.completador = CompletadorMateriais(self.material_detector.catalogo)
         self.zpl_generator = ZPLGenerator(settings_manager)
-        self.printer_manager = PrinterManager(settings_manager)
+        self.printer_manager = printer_manager
+        
+        # Modo estação: instante da última leitura (para a latência leitura → fila)
+        self.metricas_estacao = MetricasEstacao()
+        self._inicio_leitura = None
+        
+        # Fila de impressão em segundo plano (a interface não espera o spooler),
+        # com journal no banco para não perder trabalhos numa queda
+        self.journal_impressao = JournalImpressao(db_manager.pool)
+        self.fila_impressao = FilaImpressao(
+            self.printer_manager, settings_manager, journal=self.journal_impressao
+        )
         
         self.setup_ui()
         self.connect_signals()
+        
+        # Trabalhos que não saíram antes de o programa fechar/cair
+        retomados = self.fila_impressao.retomar_pendentes()
+        if retomados:
+            self._mostrar_status_fila(f"♻️ {retomados} trabalho(s) não enviados retomados", "#f39c12")
+        
+        # Trabalhos que estavam saindo na queda: o operador decide (depois que a janela aparece)
+        QTimer.singleShot(0, self.verificar_interrompidos)
     
     def setup_ui(self):
         """Configura a interface da aba"""
@@ -69,6 +93,50 @@ class ImpressaoTab(QWidget):
         """)
         form_layout.addRow("Código:", self.codigo_input)
         
+        # Aviso de leitura (código desconhecido etc.) sem caixa de diálogo
+        self.aviso_codigo_label = QLabel()
+        self.aviso_codigo_label.setWordWrap(True)
+        self.aviso_codigo_label.hide()
+        form_layout.addRow("", self.aviso_codigo_label)
+        
+        # Sugestões enquanto digita (código ou palavras da descrição)
+        self.sugestoes_model = QStringListModel(self)
+        self.completer = QCompleter(self.sugestoes_model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setWidget(self.codigo_input)
+        self._codigos_sugeridos = []
+        
+        # Espera o operador parar de digitar antes de consultar o índice
+        self.sugestoes_timer = QTimer(self)
+        self.sugestoes_timer.setSingleShot(True)
+        self.sugestoes_timer.setInterval(150)
+        
+        # Quantidade de etiquetas (enviadas num único job com ^PQ)
+        self.quantidade_input = QSpinBox()
+        self.quantidade_input.setRange(1, 9999)
+        self.quantidade_input.setValue(1)
+        form_layout.addRow("Quantidade:", self.quantidade_input)
+        
+        # Prioridade: reimpressão urgente passa na frente de lotes em andamento
+        self.prioridade_combo = QComboBox()
+        for prioridade in PRIORIDADES:
+            self.prioridade_combo.addItem(NOMES_PRIORIDADE[prioridade], prioridade)
+        self.prioridade_combo.setCurrentIndex(PRIORIDADES.index('normal'))
+        form_layout.addRow("Prioridade:", self.prioridade_combo)
+        
+        # Modo estação: cada leitura do scanner vira trabalho na fila direto
+        self.modo_estacao_check = QCheckBox("📟 Modo estação (leitura contínua)")
+        self.modo_estacao_check.setToolTip(
+            "Material normal vai direto para a fila; sopa usa os últimos caldeirão/turno/lote"
+        )
+        self.modo_estacao_check.setChecked(self.settings_manager.usar_modo_estacao())
+        form_layout.addRow(self.modo_estacao_check)
+        
+        self.metricas_label = QLabel()
+        self.metricas_label.setStyleSheet("color: #7f8c8d; font-size: 11px;")
+        self.metricas_label.setVisible(self.modo_estacao_check.isChecked())
+        form_layout.addRow(self.metricas_label)
+        
         # Botão buscar
         self.btn_buscar = ModernButton("🔍 Buscar Material", "primary")
         self.btn_buscar.clicked.connect(self.buscar_material)
@@ -144,14 +212,25 @@ class ImpressaoTab(QWidget):
         self.btn_preview.clicked.connect(self.atualizar_preview)
         self.btn_preview.setEnabled(False)
         
+        # Cancelamento: o envio é dosado, então lotes longos ainda podem ser interrompidos
+        self.btn_cancelar_fila = ModernButton("⛔ Cancelar Fila", "danger")
+        self.btn_cancelar_fila.clicked.connect(self.cancelar_fila)
+        
         # Botão de debug (temporário)
         self.btn_debug = ModernButton("🐛 Debug Impressora", "warning")
         self.btn_debug.clicked.connect(self.debug_impressora)
         
         btn_layout.addWidget(self.btn_imprimir)
         btn_layout.addWidget(self.btn_preview)
+        btn_layout.addWidget(self.btn_cancelar_fila)
         btn_layout.addWidget(self.btn_debug)
         
+        # Status da fila de impressão (sem diálogos modais)
+        self.status_fila_label = QLabel("Fila de impressão: vazia")
+        self.status_fila_label.setWordWrap(True)
+        self.status_fila_label.setStyleSheet("color: #7f8c8d; font-size: 12px;")
+        btn_layout.addWidget(self.status_fila_label)
+        
         layout.addLayout(btn_layout)
     
     def create_preview_area(self, parent):
@@ -172,16 +251,30 @@ class ImpressaoTab(QWidget):
         """Conecta sinais"""
         self.codigo_input.returnPressed.connect(self.buscar_material)
         self.codigo_input.textChanged.connect(self.on_codigo_changed)
+        self.codigo_input.textEdited.connect(self.sugestoes_timer.start)
+        self.sugestoes_timer.timeout.connect(self.mostrar_sugestoes)
+        self.completer.activated[QModelIndex].connect(self.on_sugestao_escolhida)
         
         # Sinais para campos de sopa
         self.caldeira_input.textChanged.connect(self.gerar_codigo_sopa)
         self.turno_combo.currentTextChanged.connect(self.gerar_codigo_sopa)
         self.lote_input.textChanged.connect(self.gerar_codigo_sopa)
+        self.lote_input.returnPressed.connect(self.on_lote_confirmado)
+        
+        # Modo estação
+        self.modo_estacao_check.toggled.connect(self.on_modo_estacao_changed)
+        
+        # Sinais da fila de impressão
+        self.fila_impressao.trabalho_enfileirado.connect(self.on_trabalho_enfileirado)
+        self.fila_impressao.trabalho_enviado.connect(self.on_trabalho_enviado)
+        self.fila_impressao.trabalho_falhou.connect(self.on_trabalho_falhou)
+        self.fila_impressao.trabalho_cancelado.connect(self.on_trabalho_cancelado)
     
     def debug_impressora(self):
         """Função de debug para testar a configuração da impressora"""
         try:
             impressora_nome = self.settings_manager.get_printer_name()
+            desconhecidos = self.material_detector.catalogo.desconhecidos
             
             debug_info = f"""
 🐛 DEBUG - Informações da Impressora:
@@ -193,6 +286,14 @@ class ImpressaoTab(QWidget):
 🖨️ Impressoras Disponíveis:
 {chr(10).join(f"  - {imp}" for imp in self.printer_manager.impressoras_disponiveis)}
 
+📥 Fila de impressão:
+{self.fila_impressao.diagnostico()}
+
+📟 Modo estação: {'ligado' if self.modo_estacao() else 'desligado'} — {self.metricas_label.text() or 'sem leituras'}
+
+❓ Códigos desconhecidos: {desconhecidos.total} leitura(s), {len(desconhecidos)} código(s) distintos
+{chr(10).join(f"  - {codigo}: {vezes}x" for codigo, vezes in desconhecidos.mais_frequentes())}
+
 ⚙️ Settings Manager:
   - Arquivo config: {hasattr(self.settings_manager, 'config_file')}
   - Config atual: {self.settings_manager.current_config}
@@ -207,6 +308,58 @@ class ImpressaoTab(QWidget):
         """Quando o código muda, limpa a interface"""
         self.limpar_interface()
     
+    def mostrar_sugestoes(self):
+        """Mostra os materiais que começam com o texto digitado"""
+        texto = self.codigo_input.text().strip()
+        materiais = self.completador.sugerir(texto) if len(texto) >= 2 else []
+        
+        self._codigos_sugeridos = [m.material for m in materiais]
+        self.sugestoes_model.setStringList([f"{m.material} — {m.descricao}" for m in materiais])
+        
+        if materiais:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+    
+    def registrar_codigo_desconhecido(self, codigo):
+        """Conta a leitura desconhecida e avisa sem bloquear a estação"""
+        desconhecidos = self.material_detector.catalogo.desconhecidos
+        vezes = desconhecidos.registrar(codigo)
+        
+        texto = f"❓ Código '{codigo}' não cadastrado"
+        if vezes > 1:
+            texto += f" (lido {vezes}x)"
+        texto += f" — {desconhecidos.total} leitura(s) desconhecida(s) na sessão"
+        self._mostrar_aviso_codigo(texto, "#e74c3c")
+        if self.modo_estacao():
+            QApplication.beep()
+        
+        self.codigo_input.selectAll()
+    
+    def _mostrar_aviso_codigo(self, texto, cor):
+        self.aviso_codigo_label.setText(texto)
+        self.aviso_codigo_label.setStyleSheet(f"color: {cor}; font-size: 12px; font-weight: bold;")
+        self.aviso_codigo_label.show()
+    
+    def mostrar_resultados_busca(self, texto):
+        """Lista na caixa de sugestões os materiais cuja descrição casa com o texto"""
+        resultados = self.db_manager.buscar_materiais(texto, limite=10)
+        if not resultados:
+            return False
+        
+        self._codigos_sugeridos = [material for _, material, *_ in resultados]
+        self.sugestoes_model.setStringList([
+            f"{material} — {descricao}" for _, material, descricao, *_ in resultados
+        ])
+        self.completer.complete()
+        return True
+    
+    def on_sugestao_escolhida(self, index):
+        """Preenche o código escolhido na lista e busca o material"""
+        self.sugestoes_timer.stop()
+        self.codigo_input.setText(self._codigos_sugeridos[index.row()])
+        self.buscar_material()
+    
     def limpar_interface(self):
         """Limpa a interface"""
         self.info_widget.hide()
@@ -219,18 +372,33 @@ class ImpressaoTab(QWidget):
         """Busca material e detecta tipo automaticamente"""
         codigo = self.codigo_input.text().strip()
         if not codigo:
+            if self.modo_estacao():
+                # Enter sem leitura (scanner ou tecla solta): nada a fazer, sem diálogo
+                self.codigo_input.setFocus()
+                return
             QMessageBox.warning(self, "Aviso", "Digite um código de material!")
             return
         
+        self.sugestoes_timer.stop()
+        self._inicio_leitura = time.perf_counter() if self.modo_estacao() else None
+        
         try:
             # Buscar material no banco
             material_info = self.material_detector.detectar_material(codigo)
             
             if not material_info:
-                QMessageBox.warning(self, "Material não encontrado", 
-                                  f"O material '{codigo}' não foi encontrado no banco de dados.")
+                # Talvez seja parte da descrição: oferecer os materiais encontrados
+                # (código já sabidamente desconhecido não repete a busca; no modo
+                # estação a leitura é do scanner, então não há descrição a buscar)
+                desconhecidos = self.material_detector.catalogo.desconhecidos
+                buscar = not self.modo_estacao() and codigo not in desconhecidos
+                if buscar and self.mostrar_resultados_busca(codigo):
+                    return
+                self.registrar_codigo_desconhecido(codigo)
                 return
             
+            self.aviso_codigo_label.hide()
+            
             # Mostrar informações básicas
             self.mostrar_info_material(material_info)
             
@@ -243,8 +411,15 @@ class ImpressaoTab(QWidget):
             # Atualizar preview inicial
             self.atualizar_preview()
             
+            # Modo estação: sem clique em Imprimir quando já há tudo para a etiqueta
+            if self.modo_estacao() and self._dados_sopa_completos():
+                self.imprimir_etiqueta()
+            
         except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao buscar material: {str(e)}")
+            if self.modo_estacao():
+                self._falha_estacao(f"❌ Erro ao buscar material: {str(e)}")
+            else:
+                QMessageBox.critical(self, "Erro", f"Erro ao buscar material: {str(e)}")
     
     def mostrar_info_material(self, material_info):
         """Mostra informações do material"""
@@ -262,6 +437,13 @@ class ImpressaoTab(QWidget):
         """Configura interface para sopas"""
         self.grupo_sopa.show()
         
+        # Modo estação: caldeirão/turno/lote ficam da leitura anterior
+        if self.modo_estacao():
+            self.gerar_codigo_sopa()
+            if not self._dados_sopa_completos():
+                self.caldeira_input.setFocus()
+            return
+        
         # Limpar campos
         self.caldeira_input.clear()
         self.lote_input.clear()
@@ -364,26 +546,46 @@ class ImpressaoTab(QWidget):
                     'tipo': 'normal'
                 }
             
+            dados_impressao['quantidade'] = self.quantidade_input.value()
             print(f"📤 Dados de impressão: {dados_impressao}")
             
-            # Gerar ZPL
-            zpl_code = self.zpl_generator.gerar_zpl(dados_impressao)
-            print(f"📄 ZPL gerado com sucesso ({len(zpl_code)} caracteres)")
+            # Gerar blocos do lote (^PQ para etiquetas idênticas = um único job no spooler)
+            formatos = {} if self.settings_manager.usar_formatos_armazenados() else None
+            blocos = self.zpl_generator.gerar_blocos_lote([dados_impressao], formatos)
+            
+            # Enfileirar (envio em segundo plano; resultado chega pelos sinais da fila)
+            trabalho = TrabalhoImpressao(
+                blocos, formatos,
+                descricao=dados_impressao['codigo'],
+                impressora=self.settings_manager.get_printer_name(),
+                tipo=dados_impressao['tipo'],
+                prioridade=self.prioridade_combo.currentData()
+            )
+            print(f"📄 ZPL gerado com sucesso ({len(trabalho.zpl)} caracteres)")
+            self.fila_impressao.enfileirar(trabalho)
+            self._registrar_latencia(dados_impressao['quantidade'])
+            
+            # Urgente vale só para a reimpressão atual
+            if trabalho.prioridade == 'urgente':
+                self.prioridade_combo.setCurrentIndex(PRIORIDADES.index('normal'))
+            self.limpar_campos_apos_impressao()
             
-            # Imprimir
-            if self.printer_manager.imprimir(zpl_code):
-                QMessageBox.information(self, "Sucesso", "Etiqueta enviada para impressão!")
-                self.limpar_campos_apos_impressao()
-            else:
-                QMessageBox.warning(self, "Erro", "Falha ao enviar para impressora!")
-                
         except Exception as e:
             print(f"❌ ERRO NA IMPRESSÃO: {str(e)}")
-            QMessageBox.critical(self, "Erro", f"Erro ao imprimir: {str(e)}")
+            if self.modo_estacao():
+                self._falha_estacao(f"❌ Erro ao imprimir: {str(e)}")
+            else:
+                QMessageBox.critical(self, "Erro", f"Erro ao imprimir: {str(e)}")
     
     def limpar_campos_apos_impressao(self):
         """Limpa campos após impressão bem-sucedida"""
-        if hasattr(self, 'material_info') and self.material_info['tipo'] == 'sopa':
+        if self.modo_estacao():
+            # Pronto para a próxima leitura; dados da sopa ficam como padrão
+            self.codigo_input.clear()
+            self.quantidade_input.setValue(1)
+            self.limpar_interface()
+            self.codigo_input.setFocus()
+        elif hasattr(self, 'material_info') and self.material_info['tipo'] == 'sopa':
             # Para sopas, limpa apenas os campos específicos
             self.caldeira_input.clear()
             self.lote_input.clear()
@@ -392,9 +594,117 @@ class ImpressaoTab(QWidget):
         else:
             # Para normais, limpa tudo
             self.codigo_input.clear()
+            self.quantidade_input.setValue(1)
             self.limpar_interface()
             self.codigo_input.setFocus()
     
+    def modo_estacao(self):
+        return self.modo_estacao_check.isChecked()
+    
+    def on_modo_estacao_changed(self, ativo):
+        """Liga/desliga o modo estação (salvo nas configurações)"""
+        self.settings_manager.save_settings({'modo_estacao': ativo})
+        self.metricas_estacao.iniciar()
+        self.metricas_label.setVisible(ativo)
+        self._atualizar_metricas()
+        self.codigo_input.setFocus()
+    
+    def on_lote_confirmado(self):
+        """Enter no lote imprime direto no modo estação"""
+        if self.modo_estacao() and self._dados_sopa_completos():
+            self.imprimir_etiqueta()
+    
+    def _dados_sopa_completos(self):
+        """Material atual pode ir para a fila sem mais dados do operador"""
+        if not hasattr(self, 'material_info'):
+            return False
+        if self.material_info['tipo'] != 'sopa':
+            return True
+        return bool(self.caldeira_input.text().strip() and self.lote_input.text().strip())
+    
+    def _registrar_latencia(self, etiquetas):
+        """Tempo da leitura do código até o trabalho entrar na fila"""
+        if self._inicio_leitura is None:
+            return
+        latencia = time.perf_counter() - self._inicio_leitura
+        self._inicio_leitura = None
+        self.metricas_estacao.registrar(latencia, etiquetas)
+        self._atualizar_metricas()
+    
+    def _atualizar_metricas(self):
+        resumo = self.metricas_estacao.resumo()
+        self.metricas_label.setText(
+            f"⏱️ {resumo['leituras']} leitura(s) • {resumo['etiquetas']} etiqueta(s) • "
+            f"{resumo['etiquetas_por_hora']:.0f} etiq./h • leitura→fila "
+            f"{resumo['latencia_media_ms']:.0f} ms (p95 {resumo['latencia_p95_ms']:.0f} ms)"
+        )
+    
+    def _falha_estacao(self, texto):
+        """Erro no modo estação: aviso e bip, sem caixa de diálogo"""
+        self._mostrar_aviso_codigo(texto, "#e74c3c")
+        QApplication.beep()
+        self.codigo_input.selectAll()
+        self.codigo_input.setFocus()
+    
+    def on_trabalho_enfileirado(self, trabalho_id, pendentes):
+        """Trabalho entrou na fila"""
+        self._mostrar_status_fila(f"⏳ Trabalho {trabalho_id} na fila ({pendentes} pendente(s))", "#f39c12")
+    
+    def on_trabalho_enviado(self, trabalho_id, segundos):
+        """Trabalho entregue à impressora"""
+        pendentes = self.fila_impressao.pendentes()
+        self._mostrar_status_fila(
+            f"✅ Trabalho {trabalho_id} enviado em {segundos:.2f}s ({pendentes} pendente(s))", "#27ae60"
+        )
+    
+    def on_trabalho_falhou(self, trabalho_id, erro):
+        """Falha ao enviar trabalho"""
+        self._mostrar_status_fila(f"❌ Trabalho {trabalho_id} falhou: {erro}", "#e74c3c")
+    
+    def on_trabalho_cancelado(self, trabalho_id):
+        """Trabalho cancelado antes de terminar o envio"""
+        self._mostrar_status_fila(f"⛔ Trabalho {trabalho_id} cancelado", "#7f8c8d")
+    
+    def verificar_interrompidos(self):
+        """Pergunta o que fazer com os trabalhos que estavam sendo enviados quando o programa parou"""
+        for registro in self.fila_impressao.interrompidos():
+            quantidade = sum(q for _, q in registro['blocos'])
+            restantes = sum(q for _, q in etiquetas_restantes(registro['blocos'], registro['enviadas']))
+            caixa = QMessageBox(self)
+            caixa.setIcon(QMessageBox.Question)
+            caixa.setWindowTitle("Trabalho interrompido")
+            caixa.setText(
+                f"O trabalho '{registro['descricao']}' ({quantidade} etiqueta(s) para "
+                f"'{registro['impressora']}') estava sendo enviado quando o programa parou.\n"
+                f"{quantidade - restantes} etiqueta(s) já tinham sido entregues à impressora.\n\n"
+                "Confira na impressora o que já saiu antes de reimprimir."
+            )
+            btn_reimprimir = caixa.addButton(f"🖨️ Reimprimir as {restantes} restantes", QMessageBox.AcceptRole)
+            caixa.addButton("🗑️ Descartar", QMessageBox.RejectRole)
+            caixa.exec_()
+            
+            if caixa.clickedButton() == btn_reimprimir:
+                self.fila_impressao.retomar(registro)
+            else:
+                self.fila_impressao.descartar(registro)
+    
+    def cancelar_fila(self):
+        """Cancela todos os trabalhos ainda não enviados"""
+        cancelados = self.fila_impressao.cancelar()
+        if cancelados:
+            self._mostrar_status_fila(f"⛔ Cancelando {cancelados} trabalho(s)...", "#7f8c8d")
+        else:
+            self._mostrar_status_fila("Fila de impressão: vazia", "#7f8c8d")
+    
+    def _mostrar_status_fila(self, texto, cor):
+        self.status_fila_label.setText(texto)
+        self.status_fila_label.setStyleSheet(f"color: {cor}; font-size: 12px; font-weight: bold;")
+    
+    def encerrar(self):
+        """Envia o que resta na fila, para a thread de impressão e fecha o journal"""
+        self.fila_impressao.parar()
+        self.journal_impressao.fechar()
+    
     def atualizar_configuracoes_preview(self):
         """Atualiza configurações do preview"""
         self.atualizar_preview()
\ No newline at end of file
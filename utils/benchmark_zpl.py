@@ -0,0 +1,100 @@
+"""Micro-benchmark da sanitização de texto ZPL
+
+Uso: python -m utils.benchmark_zpl [n_etiquetas]
+"""
+import sys
+import os
+import re
+import time
+import random
+import unicodedata
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.zpl_generator import ZPLGenerator, sanitizar_texto_zpl, _SUBSTITUICOES_ZPL
+
+DESCRICOES = [
+    'Arroz Branco Temperado com Legumes',
+    'Sopa de Legumes com Frango e Batata Doce',
+    'Caldo de Feijão Cremoso',
+    'Purê de Abóbora Cabotiá',
+    'Frango Grelhado ao Molho de Limão',
+    'Feijoada Light – Porção ½ kg',
+    'Creme de Milho Verde',
+    'Estrogonofe de Carne…',
+]
+
+
+def sanitizar_legado(texto):
+    """Implementação anterior: dict + str.replace por caractere + NFKD + regex"""
+    if not texto:
+        return ""
+    substituicoes = dict(_SUBSTITUICOES_ZPL)
+    for char_especial, char_ascii in substituicoes.items():
+        texto = texto.replace(char_especial, char_ascii)
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = texto.encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^\x20-\x7E]', '', texto)
+
+
+class _SettingsBenchmark:
+    """Layout padrão sem depender do QSettings"""
+    layout_version = 0
+
+    def get_layout_config(self):
+        return {
+            'fonte_titulo': 18, 'fonte_subtitulo': 14, 'fonte_texto': 12,
+            'centralizar': True, 'espacamento': 25, 'margem_x': 20, 'margem_y': 20,
+            'velocidade_impressao': 4
+        }
+
+
+def _gerar_etiquetas(n):
+    rnd = random.Random(42)
+    etiquetas = []
+    for i in range(n):
+        etiquetas.append({
+            'codigo': f"MAT{rnd.randint(1, 300):03d}",
+            'descricao': rnd.choice(DESCRICOES),
+            'validade': '30/06/2025',
+            'tipo': 'normal'
+        })
+    return etiquetas
+
+
+def _medir(funcao, etiquetas):
+    inicio = time.perf_counter()
+    for dados in etiquetas:
+        funcao(dados['codigo'])
+        funcao(dados['descricao'])
+        funcao(dados['validade'])
+    return time.perf_counter() - inicio
+
+
+def main(n=10000):
+    etiquetas = _gerar_etiquetas(n)
+
+    sanitizar_texto_zpl.cache_clear()
+    t_legado = _medir(sanitizar_legado, etiquetas)
+    t_tabela = _medir(sanitizar_texto_zpl.__wrapped__, etiquetas)
+    t_cache = _medir(sanitizar_texto_zpl, etiquetas)
+    info_cache = sanitizar_texto_zpl.cache_info()
+
+    gerador = ZPLGenerator(_SettingsBenchmark())
+    inicio = time.perf_counter()
+    for dados in etiquetas:
+        gerador.gerar_zpl(dados)
+    t_etiqueta = time.perf_counter() - inicio
+
+    print(f"📊 Sanitização de {n} etiquetas (3 campos cada):")
+    print(f"   Legado (replace + NFKD + regex): {t_legado * 1e6 / n:8.2f} µs/etiqueta")
+    print(f"   Tabela str.translate:            {t_tabela * 1e6 / n:8.2f} µs/etiqueta")
+    print(f"   Tabela + cache LRU:              {t_cache * 1e6 / n:8.2f} µs/etiqueta")
+    print(f"   Economia por etiqueta:           {(t_legado - t_cache) * 1e6 / n:8.2f} µs "
+          f"({t_legado / t_cache:.1f}x)")
+    print(f"   Cache: {info_cache}")
+    print(f"📄 Geração completa de ZPL: {t_etiqueta * 1e6 / n:8.2f} µs/etiqueta")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -20,12 +20,23 @@ class SettingsManager:
             'margem_x': 20,
             'margem_y': 20,
             'impressora': '',
+            'formatos_armazenados': False,
+            'transportes': {},
+            'janela_agrupamento_ms': 100,
+            'pools_impressoras': {},
+            'velocidade_impressao': 4,
+            'etiquetas_a_frente': 10,
+            'modo_estacao': False,
+            'usar_wal': True,
             'largura_etiqueta': 472,
             'altura_etiqueta': 1181
         }
         
         # Carregar configurações salvas ou usar padrão
         self.current_config = self.load_settings()
+        
+        # Versão do layout: incrementada a cada mudança para invalidar templates compilados
+        self.layout_version = 0
     
     def load_settings(self):
         """Carrega configurações salvas"""
@@ -34,7 +45,9 @@ class SettingsManager:
             
             # Tentar carregar do QSettings primeiro
             for key, default_value in self.default_config.items():
-                if isinstance(default_value, bool):
+                if isinstance(default_value, (dict, list)):
+                    config[key] = self._carregar_json(key, default_value)
+                elif isinstance(default_value, bool):
                     config[key] = self.settings.value(key, default_value, type=bool)
                 elif isinstance(default_value, int):
                     config[key] = self.settings.value(key, default_value, type=int)
@@ -57,7 +70,9 @@ class SettingsManager:
         """Salva configurações"""
         try:
             if config:
+                layout_anterior = self.get_layout_config()
                 self.current_config.update(config)
+                self._verificar_mudanca_layout(layout_anterior)
             
             # Garantir que impressora não seja None
             if self.current_config.get('impressora') is None:
@@ -65,6 +80,8 @@ class SettingsManager:
             
             # Salvar no QSettings
             for key, value in self.current_config.items():
+                if isinstance(value, (dict, list)):
+                    value = json.dumps(value, ensure_ascii=False)
                 self.settings.setValue(key, value)
                 print(f"🔧 Salvando {key}: {value}")
             
@@ -82,6 +99,20 @@ class SettingsManager:
             print(f"❌ Erro ao salvar configurações: {e}")
             return False
     
+    def _carregar_json(self, key, default_value):
+        """Carrega valor estruturado (dict/list) salvo como JSON no QSettings"""
+        valor = self.settings.value(key, None)
+        if not valor:
+            return type(default_value)(default_value)
+        try:
+            carregado = json.loads(valor)
+            if isinstance(carregado, type(default_value)):
+                return carregado
+        except (TypeError, ValueError):
+            pass
+        print(f"⚠️ Valor inválido para '{key}', usando padrão")
+        return type(default_value)(default_value)
+    
     def save_to_json(self):
         """Salva configurações em arquivo JSON"""
         try:
@@ -100,15 +131,24 @@ class SettingsManager:
             'centralizar': self.current_config.get('centralizar', True),
             'espacamento': self.current_config.get('espacamento', 25),
             'margem_x': self.current_config.get('margem_x', 20),
-            'margem_y': self.current_config.get('margem_y', 20)
+            'margem_y': self.current_config.get('margem_y', 20),
+            'velocidade_impressao': self.get_velocidade_impressao()
         }
     
     def update_layout_config(self, layout_config):
         """Atualiza configurações de layout"""
+        layout_anterior = self.get_layout_config()
         self.current_config.update(layout_config)
+        self._verificar_mudanca_layout(layout_anterior)
         # Salvar automaticamente
         self.save_settings()
     
+    def _verificar_mudanca_layout(self, layout_anterior):
+        """Incrementa a versão do layout se algum valor mudou"""
+        if self.get_layout_config() != layout_anterior:
+            self.layout_version += 1
+            print(f"🎨 Layout alterado (versão {self.layout_version})")
+    
     def get_printer_name(self):
         """Retorna nome da impressora"""
         impressora = self.current_config.get('impressora', '')
@@ -144,13 +184,78 @@ class SettingsManager:
         
         return success
     
+    def get_transporte_impressora(self, impressora):
+        """Retorna o transporte configurado para a impressora
+        
+        {'tipo': 'spooler'} (padrão), {'tipo': 'tcp', 'host': ..., 'porta': 9100},
+        {'tipo': 'lp'} (stdin do lp em modo raw) ou {'tipo': 'dispositivo', 'caminho': ...}
+        """
+        transporte = self.current_config.get('transportes', {}).get(impressora)
+        return dict(transporte) if transporte else {'tipo': 'spooler'}
+    
+    def save_transporte_impressora(self, impressora, transporte):
+        """Salva o transporte de uma impressora ('spooler' remove a configuração)"""
+        transportes = dict(self.current_config.get('transportes', {}))
+        if not transporte or transporte.get('tipo', 'spooler') == 'spooler':
+            transportes.pop(impressora, None)
+        else:
+            transportes[impressora] = transporte
+        return self.save_settings({'transportes': transportes})
+    
+    def get_pool(self, nome):
+        """Retorna o pool {'impressoras': [...], 'estrategia': ...} com esse nome, ou None"""
+        pool = self.current_config.get('pools_impressoras', {}).get(nome)
+        return dict(pool) if pool else None
+    
+    def get_pools(self):
+        """Retorna todos os pools de impressoras"""
+        return dict(self.current_config.get('pools_impressoras', {}))
+    
+    def save_pool(self, nome, impressoras, estrategia='rodizio'):
+        """Salva um pool de impressoras (estratégia 'rodizio' ou 'menos_fila')"""
+        pools = self.get_pools()
+        pools[nome] = {'impressoras': list(impressoras), 'estrategia': estrategia}
+        return self.save_settings({'pools_impressoras': pools})
+    
+    def remove_pool(self, nome):
+        """Remove um pool de impressoras"""
+        pools = self.get_pools()
+        pools.pop(nome, None)
+        return self.save_settings({'pools_impressoras': pools})
+    
+    def get_janela_agrupamento(self):
+        """Janela (em segundos) para juntar trabalhos da mesma impressora num só job"""
+        return max(0, int(self.current_config.get('janela_agrupamento_ms', 100))) / 1000.0
+    
+    def get_velocidade_impressao(self):
+        """Velocidade de impressão (^PR) em polegadas por segundo"""
+        return min(14, max(2, int(self.current_config.get('velocidade_impressao', 4))))
+    
+    def get_etiquetas_a_frente(self):
+        """Máximo de etiquetas enviadas à frente do que a impressora já imprimiu (0 = sem limite)"""
+        return max(0, int(self.current_config.get('etiquetas_a_frente', 10)))
+    
+    def usar_modo_estacao(self):
+        """Modo estação: leitura do scanner vai direto para a fila, sem diálogos"""
+        return bool(self.current_config.get('modo_estacao', False))
+    
+    def usar_wal(self):
+        """Banco em modo WAL (desligar se o banco estiver num compartilhamento de rede)"""
+        return bool(self.current_config.get('usar_wal', True))
+    
+    def usar_formatos_armazenados(self):
+        """Indica se o layout deve ficar armazenado na impressora (^DF/^XF)"""
+        return bool(self.current_config.get('formatos_armazenados', False))
+    
     def get_default_config(self):
         """Retorna configuração padrão"""
         return self.default_config.copy()
     
     def reset_to_default(self):
         """Reseta para configuração padrão"""
+        layout_anterior = self.get_layout_config()
         self.current_config = self.default_config.copy()
+        self._verificar_mudanca_layout(layout_anterior)
         self.save_settings()
         return self.current_config
     
@@ -0,0 +1,114 @@
+"""Verificação do cancelamento na FilaImpressao com um pool de impressoras falsas
+
+Uso: python -m utils.verificar_fila_impressao
+
+Um lote grande é dividido entre as três impressoras do pool e enviado em
+remessas dosadas: sem cancelamento todas as etiquetas saem, e depois do
+cancelamento nenhuma parte pode continuar mandando etiquetas.
+"""
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication
+
+from core.fila_impressao import FilaImpressao, TrabalhoImpressao
+
+IMPRESSORAS = ['A', 'B', 'C']
+
+
+class _SettingsVerificacao:
+    def get_pool(self, nome):
+        return {'impressoras': IMPRESSORAS, 'estrategia': 'rodizio'} if nome == 'Pool' else None
+
+    def get_janela_agrupamento(self):
+        return 0.0
+
+    def get_etiquetas_a_frente(self):
+        return 2
+
+    def get_etiqueta_size(self):
+        return {'altura': 203}   # 1 polegada: 0,25 s por etiqueta a 4 ips
+
+    def get_velocidade_impressao(self):
+        return 4
+
+
+class _MonitorVerificacao:
+    """Todas as impressoras saudáveis e acompanhadas por ~HS (envio dosado)"""
+
+    def pode_imprimir(self, impressora):
+        return True, None
+
+    def monitorada(self, impressora):
+        return True
+
+
+class _PrinterManagerVerificacao:
+    def __init__(self):
+        self.monitor = _MonitorVerificacao()
+        self.envios = []   # (instante, impressora, etiquetas)
+        self._lock = threading.Lock()
+
+    def imprimir(self, zpl, formatos, impressora):
+        etiquetas = sum(int(trecho.split('^')[0]) for trecho in zpl.split('^PQ')[1:])
+        with self._lock:
+            self.envios.append((time.monotonic(), impressora, etiquetas))
+
+
+def verificar_cancelamento_dividido():
+    printer_manager = _PrinterManagerVerificacao()
+    fila = FilaImpressao(printer_manager, _SettingsVerificacao())
+
+    trabalho = TrabalhoImpressao([("^XA^FDx^FS^XZ", 60)], None, "Lote", "Pool")
+    fila.enfileirar(trabalho)
+    time.sleep(0.3)
+    fila.cancelar(trabalho.id)
+    cancelado_em = time.monotonic()
+    time.sleep(1.5)
+    fila.parar()
+
+    # Uma remessa já em envio no instante do cancelamento pode terminar; nenhuma começa depois
+    depois = [(impressora, etiquetas) for instante, impressora, etiquetas in printer_manager.envios
+              if instante > cancelado_em + 0.05]
+    antes = sum(etiquetas for instante, _, etiquetas in printer_manager.envios if instante <= cancelado_em + 0.05)
+    ok = not depois and fila.pendentes() == 0 and not fila._cancelados
+    return ok, f"{antes} etiqueta(s) antes do cancelamento, remessas depois: {depois or 'nenhuma'}"
+
+
+def verificar_lote_dividido_completo():
+    printer_manager = _PrinterManagerVerificacao()
+    fila = FilaImpressao(printer_manager, _SettingsVerificacao())
+
+    trabalho = TrabalhoImpressao([("^XA^FDx^FS^XZ", 30)], None, "Lote", "Pool")
+    fila.enfileirar(trabalho)
+    fila.parar(timeout=10.0)
+
+    total = sum(etiquetas for _, _, etiquetas in printer_manager.envios)
+    impressoras = sorted({impressora for _, impressora, _ in printer_manager.envios})
+    ok = total == 30 and impressoras == IMPRESSORAS and not fila._partes_vivas
+    return ok, f"{total} etiqueta(s) em {', '.join(impressoras)}"
+
+
+def main():
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+    verificacoes = [
+        ("Lote dividido sem cancelamento sai inteiro", verificar_lote_dividido_completo),
+        ("Cancelamento de lote dividido para todas as partes", verificar_cancelamento_dividido),
+    ]
+
+    falhas = 0
+    for nome, verificacao in verificacoes:
+        ok, detalhe = verificacao()
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {nome}: {detalhe}")
+
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Verificação do PoolConexoesTCP contra um servidor TCP local no papel da impressora
+
+Uso: python -m utils.verificar_transporte_tcp
+
+Confere que a conexão é reaproveitada, que uma conexão derrubada antes do
+envio é refeita sem perder o job e que um envio interrompido no meio não é
+reenviado (o que duplicaria etiquetas).
+"""
+import sys
+import os
+import socket
+import struct
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.transporte_rede import PoolConexoesTCP
+
+
+class ImpressoraFalsa:
+    """Servidor raw TCP local que guarda o que recebe por conexão
+
+    Com `derrubar_apos` bytes recebidos, a conexão é resetada (RST), como
+    uma impressora que cai no meio de um job.
+    """
+
+    def __init__(self, derrubar_apos=None):
+        self.derrubar_apos = derrubar_apos
+        self.conexoes = []
+        self.recebido = {}
+        self._servidor = socket.socket()
+        self._servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._servidor.bind(('127.0.0.1', 0))
+        self._servidor.listen()
+        self.porta = self._servidor.getsockname()[1]
+        threading.Thread(target=self._aceitar, daemon=True).start()
+
+    def total_recebido(self):
+        return sum(len(dados) for dados in self.recebido.values())
+
+    def _aceitar(self):
+        while True:
+            conexao, _ = self._servidor.accept()
+            self.conexoes.append(conexao)
+            self.recebido[conexao] = b""
+            threading.Thread(target=self._ler, args=(conexao,), daemon=True).start()
+
+    def _ler(self, conexao):
+        while True:
+            try:
+                dados = conexao.recv(65536)
+            except OSError:
+                return
+            if not dados:
+                return
+            self.recebido[conexao] += dados
+            if self.derrubar_apos is not None and len(self.recebido[conexao]) >= self.derrubar_apos:
+                # SO_LINGER com tempo zero: close() manda RST em vez de FIN
+                conexao.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                conexao.close()
+                return
+
+
+def esperar(condicao, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicao()
+
+
+def verificar_reaproveitamento():
+    impressora = ImpressoraFalsa()
+    pool = PoolConexoesTCP('127.0.0.1', impressora.porta)
+    jobs = [b'^XA^FD%d^FS^XZ' % i for i in range(5)]
+    for job in jobs:
+        pool.enviar(job)
+
+    esperado = b"".join(jobs)
+    ok = esperar(lambda: impressora.total_recebido() == len(esperado))
+    return ok and pool.conexoes_abertas == 1, f"{pool.conexoes_abertas} conexão(ões) para {len(jobs)} jobs"
+
+
+def verificar_reconexao_antes_do_envio():
+    impressora = ImpressoraFalsa()
+    pool = PoolConexoesTCP('127.0.0.1', impressora.porta)
+    pool.enviar(b'^XA^FDprimeiro^FS^XZ')
+    esperar(lambda: impressora.total_recebido() > 0)
+
+    # Conexão ociosa morta do nosso lado: o envio falha sem sair nenhum byte
+    pool._livres[0].shutdown(socket.SHUT_WR)
+    job = b'^XA^FDsegundo^FS^XZ'
+    pool.enviar(job)
+
+    ok = esperar(lambda: any(dados == job for dados in impressora.recebido.values()))
+    return ok and pool.reconexoes == 1, f"{pool.reconexoes} reconexão(ões), job entregue uma vez: {ok}"
+
+
+def verificar_envio_parcial():
+    impressora = ImpressoraFalsa(derrubar_apos=64 * 1024)
+    pool = PoolConexoesTCP('127.0.0.1', impressora.porta)
+    job = b'^XA^FDx^FS^PQ1^XZ' * 2_000_000
+
+    try:
+        pool.enviar(job)
+        return False, "o envio interrompido não gerou erro"
+    except ConnectionError as e:
+        erro = e
+
+    time.sleep(0.2)
+    ok = len(impressora.conexoes) == 1 and impressora.total_recebido() < len(job)
+    return ok, f"{len(impressora.conexoes)} conexão(ões) aberta(s); erro: {erro}"
+
+
+def main():
+    verificacoes = [
+        ("Conexão reaproveitada entre jobs", verificar_reaproveitamento),
+        ("Conexão morta antes do envio é refeita", verificar_reconexao_antes_do_envio),
+        ("Envio interrompido no meio não é reenviado", verificar_envio_parcial),
+    ]
+
+    falhas = 0
+    for nome, verificacao in verificacoes:
+        ok, detalhe = verificacao()
+        falhas += not ok
+        print(f"{'✅' if ok else '❌'} {nome}: {detalhe}")
+
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()